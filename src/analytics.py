@@ -0,0 +1,171 @@
+from argparse import ArgumentParser
+from bisect import bisect_left, bisect_right
+from json import load as json_load
+from sys import exit
+
+from bingo import Bingo
+from events import EventLog, TOGGLE, REPLACE, POKEMON, POKEMON_STATUS, RESET
+
+def completion_rate(log: EventLog, window: float, start: float | None=None, end: float | None=None) -> list:
+    """
+    Completions and un-completions per time window (in seconds) as (window start, completed, uncompleted) tuples.
+    Only the events between start and end are looked at, found by bisecting the timestamp column.
+    """
+    t = log.columns["t"]
+    if not len(t):
+        return []
+    start = t[0] if start is None else start
+    end = t[-1] if end is None else end
+    first = bisect_left(t, start)
+    last = bisect_right(t, end, lo=first)
+    buckets = [[start + n*window, 0, 0] for n in range(int((end - start) / window) + 1)]
+    kind = log.columns["kind"]
+    value = log.columns["value"]
+    for pos in range(first, last):
+        if kind[pos] == TOGGLE or kind[pos] == POKEMON_STATUS:
+            bucket = buckets[int((t[pos] - start) / window)]
+            bucket[1 if value[pos] == 1 else 2] += 1
+    return [tuple(bucket) for bucket in buckets]
+
+def replay(log: EventLog, size: int, pokemon: bool):
+    """
+    Walks through the log while keeping track of the board.
+    Yields (position, time, cells that got a new objective, bitmask of cells that got completed or uncompleted,
+    bitmask of completed cells, grid as name ids, status per name id) after every event.
+    """
+    t, kind, cell, obj, value = (log.columns[c] for c in ("t", "kind", "cell", "obj", "value"))
+    middle = int(size/2) * (size+1) if pokemon else -1
+    everything = range(size*size)
+    nothing = ()
+    bits = "{:0" + str(size*size) + "b}"
+    grid = [-1] * (size*size)
+    status = {}
+    done = 0
+    for pos in range(len(t)):
+        k = kind[pos]
+        before = done
+        placed = nothing
+        if k == TOGGLE:
+            status[obj[pos]] = value[pos]
+            c = cell[pos]
+            while c >= 0:   # the same objective can be on the board twice
+                done = done | (1 << c) if value[pos] else done & ~(1 << c)
+                c = grid.index(obj[pos], c+1) if obj[pos] in grid[c+1:] else -1
+        elif k == POKEMON_STATUS:
+            done = done | (1 << middle) if value[pos] else done & ~(1 << middle)
+        elif k == REPLACE or k == POKEMON:
+            c = cell[pos]
+            if c != middle:
+                done = done | (1 << c) if status.get(obj[pos], 0) else done & ~(1 << c)
+            grid[c] = obj[pos]
+            placed = (c,)
+        elif k == RESET:
+            status = dict.fromkeys(status, 0)
+            done = 0
+        else:   # populate, shuffle and undo come with a whole layout
+            layout = log.layouts[value[pos]]
+            ids, done = layout[0], layout[1]
+            grid = list(ids)
+            if len(layout) > 2:     # statuses an undo reverted, also off the board
+                status.update(layout[2])
+            status.update(zip(grid, map(int, reversed(bits.format(done)))))
+            if middle >= 0:
+                status.pop(grid[middle])
+            placed = everything
+        yield pos, t[pos], placed, before ^ done, done, grid, status
+
+def time_to_complete(log: EventLog, size: int, pokemon: bool) -> dict:
+    """
+    Seconds from an objective first landing on the board (while open) to it getting completed, per objective name.
+    """
+    middle = int(size/2) * (size+1) if pokemon else -1
+    kind = log.columns["kind"]
+    value = log.columns["value"]
+    obj = log.columns["obj"]
+    placed_at = {}
+    done_in = {}
+    for pos, t, placed, _, _, grid, status in replay(log, size, pokemon):
+        for c in placed:
+            if c != middle and grid[c] not in placed_at and not status.get(grid[c], 0):
+                placed_at[grid[c]] = t
+        if kind[pos] == TOGGLE and value[pos] == 1 and obj[pos] in placed_at and obj[pos] not in done_in:
+            done_in[obj[pos]] = t - placed_at[obj[pos]]
+    return {log.names[name]: seconds for name, seconds in done_in.items()}
+
+def line_timeline(log: EventLog, size: int, pokemon: bool) -> list:
+    """
+    Every time a line got completed or broken again, as (time, line index, complete) tuples.
+    Line indices follow Bingo.lines(): rows, columns, then both diagonals.
+    """
+    masks = []
+    for line in Bingo(size, pokemon, active=False).lines():
+        mask = 0
+        for i, j in line:
+            mask |= 1 << (i*size + j)
+        masks.append(mask)
+    complete = [False] * len(masks)
+    timeline = []
+    for _, t, _, flipped, done, _, _ in replay(log, size, pokemon):
+        if flipped:
+            for n, mask in enumerate(masks):
+                if mask & flipped and (done & mask == mask) != complete[n]:
+                    complete[n] = not complete[n]
+                    timeline.append((t, n, complete[n]))
+    return timeline
+
+def line_name(n: int, size: int) -> str:
+    if n < size:
+        return "Row " + str(n+1)
+    elif n < 2*size:
+        return "Column " + str(n-size+1)
+    elif n == 2*size:
+        return "Diagonal \\"
+    return "Diagonal /"
+
+def duration(seconds: float) -> str:
+    seconds = int(seconds)
+    return "{}:{:02d}:{:02d}".format(seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+def report(data: dict, window: float=3600) -> str:
+    """
+    Readable session report of a save file's contents.
+    """
+    if "events" not in data:
+        return "This session has no event log."
+    log = EventLog.fromDict(data["events"])
+    if not len(log):
+        return "Nothing happened yet."
+    size = int(data["size"])
+    pokemon = data["pokemon"]
+    t = log.columns["t"]
+    start = t[0]
+    rate = completion_rate(log, window)
+
+    lines = ["Session length: " + duration(t[-1] - start) + ", " + str(len(log)) + " events, "
+             + str(sum(bucket[1] for bucket in rate)) + " completions", ""]
+    lines.append("Completions per " + duration(window) + ":")
+    for bucket_start, completed, uncompleted in rate:
+        lines.append("  {} - {}  {:>4}{}".format(duration(bucket_start - start), duration(bucket_start - start + window), completed,
+                                                  "  ({} undone)".format(uncompleted) if uncompleted else ""))
+    lines.append("")
+    lines.append("Line timeline:")
+    for when, n, complete in line_timeline(log, size, pokemon):
+        lines.append("  {}  {} {}".format(duration(when - start), line_name(n, size), "complete" if complete else "broken"))
+    lines.append("")
+    lines.append("Time to complete:")
+    for name, seconds in sorted(time_to_complete(log, size, pokemon).items(), key=lambda item: item[1]):
+        lines.append("  {}  {}".format(duration(seconds), name))
+    return "\n".join(lines)
+
+def main() -> int:
+    parser = ArgumentParser(description="Session analytics for a Bearathon bingo save file.")
+    parser.add_argument("save_file")
+    parser.add_argument("--window", type=float, default=60, help="window for the completion rate, in minutes")
+    args = parser.parse_args()
+    with open(args.save_file, "r") as f:
+        data = json_load(f)
+    print(report(data, args.window * 60))
+    return 0
+
+if __name__ == "__main__":
+    exit(main())
@@ -1,15 +1,64 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 from copy import deepcopy
 from csv import reader as csv_reader
-from random import randint, choice as random_choice
+from hashlib import sha1
+from json import dumps as json_dumps, load as json_load, loads as json_loads
+from math import ceil, isfinite
+from os import path as os_path
+from random import Random, randrange
+from zlib import compress, decompress
+
+from events import EventLog, TOGGLE, REPLACE, SHUFFLE, POPULATE, POKEMON, POKEMON_STATUS, RESET, UNDO, RENAME
+from generator import balanced_grid, cap_feasible
+from templates import Template, placeholders
+
+def row_weight(row: list) -> float | None:
+    """
+    Difficulty weight of a list row, or None if it has none. Raises a ValueError naming the objective if it isn't a number.
+    """
+    if len(row) < 2 or not row[1].strip():
+        return None
+    try:
+        weight = float(row[1])
+    except ValueError:
+        weight = None
+    if weight is None or not isfinite(weight):
+        raise ValueError('The weight of "{}" is not a number: {}'.format(row[0], row[1].strip()))
+    return weight
 
 class Bingo:
-    def __init__(self, size: int, pokemon: bool, active: bool=True, new: bool=True, list_file: str=""):
+    def __init__(self, size: int, pokemon: bool, active: bool=True, new: bool=True, list_file: str="", balance: dict | None=None,
+                 seed: int | None=None):
         self.size = size
         self.pokemon_bool = pokemon
         self.active = active
 
+        # Every random decision goes through this rng, so the seed plus the history rebuilds the board.
+        self.seed = seed if seed is not None else randrange(2**32)
+        self.rng = Random(self.seed)
+        self.history = []
+        self.list_hash = ""
+        self.replaying = False
+        self.events = EventLog()
+
         self.grid = []
         self.list = {}
+        self.weights = {}
+        self.categories = {}
+        # Templated objectives stand for all their combinations; one only gets into the list once it's placed.
+        self.templates = []
+        self.sources = {}
+        self.expanded = {}
+        self.key_cache = None
+        # A linked list file gets watched for edits. Objectives removed from it while on the board are flagged until they leave.
+        self.list_file = ""
+        self.link = {}
+        self.flagged = set()
+        # category_cap -1 picks a cap that scales with the board size
+        self.balance = {"tolerance": 0.15, "category_cap": -1, "time_budget": 0.5}
+        if balance:
+            self.balance.update(balance)
+        self.balance_fallback = ""     # why the last populate couldn't balance the board, for the UI to show
         self.pokemon_list = []
         self.current_pokemon = ""
         self.pokemon_status = 0
@@ -20,63 +69,443 @@ class Bingo:
                 self.populate()
 
     @classmethod
-    def fromSave(cls, size: int, pokemon: bool, grid: list, obj_list: dict, current_pokemon: str, pokemon_status: int, active: bool=True):
-        bingo = cls(size, pokemon, active=active, new=False)
+    def fromSave(cls, size: int, pokemon: bool, grid: list, obj_list: dict, current_pokemon: str, pokemon_status: int, active: bool=True,
+                 weights: dict | None=None, categories: dict | None=None, balance: dict | None=None,
+                 seed: int | None=None, rng_state: list | None=None, history: list | None=None, list_hash: str="",
+                 events: dict | None=None, templates: list | None=None, sources: dict | None=None, expanded: dict | None=None,
+                 list_file: str="", link: dict | None=None, flagged: list | None=None):
+        bingo = cls(size, pokemon, active=active, new=False, balance=balance, seed=seed)
         bingo.grid = grid
         bingo.list = obj_list
+        bingo.weights = weights or {}
+        bingo.categories = categories or {}
+        bingo.sources = sources or {}
+        bingo.templates = [Template(pattern, bingo.template_sources()) for pattern in templates or []]
+        bingo.expanded = expanded or {}
+        bingo.list_file = list_file
+        bingo.link = link or {}
+        bingo.flagged = set(flagged or [])
         bingo.current_pokemon = current_pokemon
         bingo.pokemon_status = pokemon_status
+        if rng_state:
+            bingo.rng.setstate((rng_state[0], tuple(rng_state[1]), rng_state[2]))
+        bingo.history = history or []
+        bingo.list_hash = list_hash
+        if events:
+            bingo.events = EventLog.fromDict(events)
+        return bingo
+
+    @classmethod
+    def fromCode(cls, code: str, list_file: str, active: bool=True):
+        """
+        Rebuilds a bingo from a board code and the objectives list it was made from.
+        Raises a ValueError if the list doesn't match or the rebuilt board differs from the shared one.
+        """
+        try:
+            data = json_loads(decompress(urlsafe_b64decode(code.strip() + "=" * (-len(code.strip()) % 4))))
+        except Exception:
+            raise ValueError("Not a valid board code.")
+        bingo = cls(data["n"], data["k"], active=active, new=False,
+                    balance={"tolerance": data["b"][0], "category_cap": data["b"][1]}, seed=data["s"])
+        bingo.import_list(list_file)
+        if bingo.list_hash != data["l"]:
+            raise ValueError("This board code was made from a different objectives list.")
+        bingo.replay(data["h"])
+        if bingo.grid_hash() != data["g"]:
+            raise ValueError("The rebuilt board doesn't match the shared one.")
         return bingo
     
+    def __deepcopy__(self, memo: dict):
+        """
+        An undo snapshot gets taken before every action, so only what can change gets copied and the rest is shared.
+        """
+        bingo = self.__class__.__new__(self.__class__)
+        bingo.__dict__.update(self.__dict__)
+        bingo.grid = [row.copy() for row in self.grid]
+        bingo.list = self.list.copy()
+        bingo.weights = self.weights.copy()
+        bingo.categories = self.categories.copy()
+        bingo.templates = self.templates.copy()     # Template objects themselves don't change
+        bingo.sources = self.sources.copy()
+        bingo.expanded = self.expanded.copy()
+        bingo.flagged = self.flagged.copy()
+        bingo.balance = self.balance.copy()
+        bingo.history = self.history.copy()    # entries are never changed in place
+        bingo.rng = Random()
+        bingo.rng.setstate(self.rng.getstate())
+        bingo.events = self.events.copy()
+        return bingo
+
     def toDict(self) -> dict:
         return {"size": self.size,
                 "pokemon": self.pokemon_bool,
                 "grid": self.grid,
                 "list": self.list,
                 "current_pokemon": self.current_pokemon,
-                "pokemon_status": self.pokemon_status}
+                "pokemon_status": self.pokemon_status,
+                "weights": self.weights,
+                "categories": self.categories,
+                "balance": self.balance,
+                "seed": self.seed,
+                "rng_state": self.rng.getstate(),
+                "history": self.history,
+                "list_hash": self.list_hash,
+                "events": self.events.toDict(),
+                "templates": [template.pattern for template in self.templates],
+                "sources": self.sources,
+                "expanded": self.expanded,
+                "list_file": self.list_file,
+                "link": self.link,
+                "flagged": sorted(self.flagged)}
+
+    def board_code(self) -> str:
+        """
+        Compact code of the list hash, the seed and the operation history. Together with the list file this rebuilds the exact board.
+        """
+        data = {"l": self.list_hash,
+                "n": self.size,
+                "k": self.pokemon_bool,
+                "b": [self.balance["tolerance"], self.balance["category_cap"]],
+                "s": self.seed,
+                "h": self.compact_history(),
+                "g": self.grid_hash()}
+        code = urlsafe_b64encode(compress(json_dumps(data, separators=(",", ":")).encode(), 9))
+        return code.decode().rstrip("=")
+
+    def compact_history(self) -> list:
+        """
+        The history without the status changes a replay doesn't need. Statuses only matter to the next operation that draws
+        objectives or changes the list, so a run of status changes up to there becomes the final status of each objective,
+        and nothing if it ended where it started. Shuffles don't look at statuses and a reset overwrites them all.
+        """
+        compacted = []
+        status = {}     # known status of each objective before the current run (missing is 0, None is unknown)
+        run = {}
+        for op in self.history:
+            if op[0] == "t":
+                run[op[1]] = op[2]
+                continue
+            if op[0] == "s":
+                compacted.append(op)
+                continue
+            if op[0] == "x":
+                run = {}
+            for objective, value in run.items():
+                if status.get(objective, 0) != value:
+                    compacted.append(["t", objective, value])
+                    status[objective] = value
+            run = {}
+            if op[0] == "x":
+                status.clear()
+            elif op[0] in ("a", "d"):
+                status.pop(op[1], None)
+            elif op[0] == "n":
+                status[op[2]] = status.pop(op[1], 0)
+            elif op[0] == "f":
+                status[op[1]] = None     # it leaves the list (whatever its status) once it's off the board
+            compacted.append(op)
+        for objective, value in run.items():
+            if status.get(objective, 0) != value:
+                compacted.append(["t", objective, value])
+        return compacted
+
+    def grid_hash(self) -> str:
+        return sha1(json_dumps(self.grid).encode()).hexdigest()[:10]
+
+    def replay(self, history: list) -> None:
+        """
+        Re-applies a recorded operation history. Balanced generation gets no time limit here,
+        so a board that was found in time is found again on a slower machine.
+        """
+        self.replaying = True
+        try:
+            for op in history:
+                if op[0] == "p":
+                    self.populate(balanced=len(op) == 1)
+                elif op[0] == "s":
+                    self.shuffle()
+                elif op[0] == "r":
+                    self.replace(op[1], op[2], len(op) == 3, *op[3:])
+                elif op[0] == "t":
+                    self.set_status(op[1], op[2])
+                elif op[0] == "a":
+                    self.add_objective(*op[1:])
+                elif op[0] == "d":
+                    self.remove_objective(op[1])
+                elif op[0] == "u":
+                    self.reroll_uncompleted()
+                elif op[0] == "n":
+                    self.rename_objective(op[1], op[2])
+                elif op[0] == "f":
+                    if len(op) == 2:
+                        self.flag_objective(op[1])
+                    else:
+                        self.unflag_objective(op[1])
+                elif op[0] == "w":
+                    self.update_attributes(*op[1:])
+                elif op[0] == "ta":
+                    if not self.add_template(op[1], os_path.dirname(self.list_file)):
+                        raise ValueError('No values for the placeholders of "{}" next to the list.'.format(op[1]))
+                elif op[0] == "td":
+                    self.remove_template(op[1])
+                elif op[0] == "x":
+                    for key in self.list:
+                        self.list[key] = 0
+                    self.history.append(op)
+                else:
+                    raise ValueError("Unknown operation in board code: " + str(op[0]))
+        finally:
+            self.replaying = False
 
     def import_list(self, file: str) -> None:
         """
-        Reads in the csv file.
+        Reads in the csv file. Every row is an objective, optionally followed by a difficulty weight and a category.
+        An objective with placeholders like {boss} becomes a template; the values come from boss.csv (or boss.txt)
+        next to the list, one per line. {pokemon} uses the pokemon list.
         """
+        list_hash = sha1()
+        templates = []
         with open(file, 'r') as f:
             reader = csv_reader(f, delimiter='µ')   # Just make sure the list doesn't have any 'µ' in it.
             for row in reader:
-                self.list[row[0]] = 0
+                if not row:
+                    continue
+                fields = placeholders(row[0])
+                if fields and all(self.import_source(name, os_path.dirname(file)) for name in fields):
+                    templates.append(row[0])
+                else:
+                    self.list[row[0]] = 0
+                weight = row_weight(row)
+                if weight is not None:
+                    self.weights[row[0]] = weight
+                if len(row) > 2 and row[2].strip():
+                    self.categories[row[0]] = row[2].strip()
+                list_hash.update(('µ'.join(row) + '\n').encode())
+        self.list_hash = list_hash.hexdigest()[:10]
+        self.templates = [Template(pattern, self.template_sources()) for pattern in templates]
+        self.list_file = file
+        self.key_cache = None
+
+    def import_source(self, name: str, folder: str) -> bool:
+        """
+        Loads the values for a template placeholder. Returns False if there's no file for it.
+        """
+        if name == "pokemon" or name in self.sources:
+            return True
+        for extension in (".csv", ".txt"):
+            file = os_path.join(folder, name + extension)
+            if os_path.isfile(file):
+                with open(file, "r") as f:
+                    self.sources[name] = [row[0] for row in csv_reader(f, delimiter='µ') if row and row[0].strip()]
+                return True
+        return False
+
+    def template_sources(self) -> dict:
+        return {**self.sources, "pokemon": self.pokemon_list}
 
     def export_list(self, file:str) -> None:
         """
-        Exports the list to file.
+        Exports the list to file. Templates are written back as templates, not as the objectives they made.
         """
+        lines = []
+        for objective in [key for key in self.list if key not in self.expanded] + [t.pattern for t in self.templates]:
+            line = objective
+            if objective in self.weights or objective in self.categories:
+                line += 'µ' + str(self.weight(objective))
+                if objective in self.categories:
+                    line += 'µ' + self.categories[objective]
+            lines.append(line)
         with open(file, "w") as f:
-            for i, objective in enumerate(self.list):
-                if i < len(self.list)-1:
-                    f.write(objective+'\n')
-                else:
-                    f.write(objective)
+            f.write('\n'.join(lines))
+
+    def weight(self, objective: str, template: str="") -> float:
+        """
+        Difficulty weight of an objective. Objectives made from a template have the template's weight; others without one count as 1.
+        """
+        return self.weights.get(objective, self.weights.get(template or self.expanded.get(objective, ""), 1.0))
+
+    def category(self, objective: str, template: str="") -> str:
+        return self.categories.get(objective, self.categories.get(template or self.expanded.get(objective, ""), ""))
 
-    def populate(self) -> None:
+    def objective_keys(self) -> list:
+        """
+        The list's own objectives (not the ones made from templates) as a list to draw from. Rebuilt only when objectives get added or removed.
+        """
+        if self.key_cache is None:
+            self.key_cache = [key for key in self.list if key not in self.expanded and key not in self.flagged]
+        return self.key_cache
+
+    def sample_open(self, exclude) -> tuple | None:
+        """
+        Draws a random uncompleted objective that's not in exclude, uniformly over the list and every template combination.
+        Returns (objective, template pattern or ""), or None if there's nothing left. Nothing gets added to the list here.
+        """
+        keys = self.objective_keys()
+        total = len(keys) + sum(template.count for template in self.templates)
+        for _ in range(200 if total else 0):
+            index = self.rng.randrange(total)
+            template = ""
+            if index < len(keys):
+                objective = keys[index]
+            else:
+                index -= len(keys)
+                for t in self.templates:
+                    if index < t.count:
+                        objective, template = t.expand(index), t.pattern
+                        break
+                    index -= t.count
+            if self.list.get(objective, 0) == 0 and objective not in exclude and (template or objective in self.list):
+                return objective, template
+        # Almost everything is done (or the list is tiny), so pick from what's actually left.
+        left = [(key, "") for key in keys if self.list.get(key, 1) == 0 and key not in exclude]
+        for t in self.templates:
+            left += [(objective, t.pattern) for objective in t if self.list.get(objective, 0) == 0 and objective not in exclude]
+        return self.rng.choice(left) if left else None
+
+    def place(self, i: int, j: int, objective: str, template: str="") -> None:
+        """
+        Puts an objective in a cell. One made from a template gets added to the list now.
+        """
+        if template and objective not in self.list:
+            self.list[objective] = 0
+            self.expanded[objective] = template
+        self.grid[i][j] = objective
+
+    def prune(self) -> None:
+        """
+        Drops objectives made from templates that left the board without getting completed, so the list doesn't grow with every reroll.
+        Flagged objectives (removed from the linked list file) go as soon as they left the board.
+        """
+        on_board = {obj for row in self.grid for obj in row}
+        for objective in [key for key in self.expanded if key not in on_board and self.list.get(key, 0) == 0]:
+            self.expanded.pop(objective)
+            self.list.pop(objective, None)
+        for objective in [key for key in self.flagged if key not in on_board]:
+            self.flagged.discard(objective)
+            self.list.pop(objective, None)
+            self.expanded.pop(objective, None)
+
+    def is_middle(self, i: int, j: int) -> bool:
+        return self.pokemon_bool and i == j and i == int(self.size/2)
+
+    def is_flagged(self, i: int, j: int) -> bool:
+        return self.grid[i][j] in self.flagged and not self.is_middle(i, j)
+
+    def is_completed(self, i: int, j: int) -> bool:
+        if self.is_middle(i, j):
+            return self.pokemon_status == 1
+        return self.list.get(self.grid[i][j], 0) == 1
+
+    def cells_of(self, objectives) -> list:
+        """
+        Coordinates of the cells holding any of the given objectives.
+        """
+        return [(i, j) for i, row in enumerate(self.grid) for j, obj in enumerate(row)
+                if obj in objectives and not self.is_middle(i, j)]
+
+    def cell_of(self, objective: str) -> int:
+        """
+        Index (row by row) of the cell an objective is on, or -1 if it's not on the board.
+        """
+        for i, row in enumerate(self.grid):
+            for j, obj in enumerate(row):
+                if obj == objective and not self.is_middle(i, j):
+                    return i*self.size + j
+        return -1
+
+    def log_layout(self, kind: int, statuses: dict | None=None) -> None:
+        self.events.record_layout(kind, self.grid, [self.is_completed(i, j) for i in range(self.size) for j in range(self.size)], statuses)
+
+    def lines(self) -> list:
+        """
+        All rows, columns and both diagonals as lists of coordinates.
+        """
+        lines = [[(i, j) for j in range(self.size)] for i in range(self.size)]
+        lines += [[(i, j) for i in range(self.size)] for j in range(self.size)]
+        lines.append([(i, i) for i in range(self.size)])
+        lines.append([(i, self.size-1-i) for i in range(self.size)])
+        return lines
+
+    def populate(self, balanced: bool=True) -> None:
         """
         Randomly populates the bingo with items from the list that are not completed yet.
+        If the list has weights or categories, the board gets balanced instead.
         """
-        list_copy = deepcopy(self.list)
-        self.grid = []
+        self.history.append(["p"])
+        self.balance_fallback = ""
+        balanced = balanced and bool(self.weights or self.categories)
+        if not (balanced and self.populate_balanced()):
+            if self.weights or self.categories:
+                self.history[-1] = ["p", 0]    # replays have to skip the balancing that didn't make it in time
+            self.populate_uniform()
+        self.log_layout(POPULATE)
+
+    def populate_uniform(self) -> None:
+        """
+        Populates the bingo with random uncompleted objectives, without any balancing.
+        """
+        self.grid = [[""] * self.size for _ in range(self.size)]
+        placed = set()
         for i in range(self.size):
-            row = []
             for j in range(self.size):
                 if self.pokemon_bool and i == j and i == int(self.size/2):   # middle square
                     self.current_pokemon = self.pick_random_pokemon()
-                    row.append(self.current_pokemon)
+                    self.grid[i][j] = self.current_pokemon
                 else:
-                    key = random_choice(list(list_copy.keys()))
-                    while list_copy[key] != 0:
-                        list_copy.pop(key)
-                        key = random_choice(list(list_copy.keys()))
-                    list_copy.pop(key)
-                    row.append(key)
-            self.grid.append(row)
+                    drawn = self.sample_open(placed)
+                    if drawn is None:
+                        raise ValueError("Not enough uncompleted objectives to fill the board.")
+                    self.place(i, j, *drawn)
+                    placed.add(drawn[0])
         self.pokemon_status = 0
+        self.prune()
+
+    def populate_balanced(self) -> bool:
+        """
+        Populates the bingo so every line has about the same difficulty and no category is overrepresented on a line.
+        Returns False (and leaves the grid alone) if the category cap can't be met or no such board was found within the time budget.
+        A category_cap of -1 uses a cap that scales with the board size.
+        """
+        rng_state = self.rng.getstate()
+        # Templates can stand for far more objectives than could be listed, so the search gets a random sample of the open ones.
+        drawn = {}
+        for _ in range(10 * self.size**2):
+            candidate = self.sample_open(drawn)
+            if candidate is None:
+                break
+            drawn[candidate[0]] = candidate[1]
+        categories = [self.category(obj, template) for obj, template in drawn.items()]
+        cap = self.balance["category_cap"]
+        if cap < 0:
+            # at least 2 of a category per 5 cells of a line, raised until the objectives at hand can fill the board
+            cap = max(2, ceil(2 * self.size / 5))
+            while cap < self.size and not cap_feasible(self.size, self.pokemon_bool, categories, cap):
+                cap += 1
+        elif not cap_feasible(self.size, self.pokemon_bool, categories, cap):
+            self.rng.setstate(rng_state)
+            self.balance_fallback = "Too few objectives outside the biggest categories for {} per category on a line.".format(cap)
+            return False
+        grid = balanced_grid(self.size, self.pokemon_bool, list(drawn),
+                             lambda obj: self.weight(obj, drawn[obj]), lambda obj: self.category(obj, drawn[obj]), self.lines(),
+                             tolerance=self.balance["tolerance"],
+                             category_cap=cap,
+                             time_budget=float("inf") if self.replaying else self.balance["time_budget"],
+                             rng=self.rng)
+        if grid is None:
+            self.rng.setstate(rng_state)
+            self.balance_fallback = "No balanced board found within {:g} s.".format(self.balance["time_budget"])
+            return False
+        if self.pokemon_bool:
+            self.current_pokemon = self.pick_random_pokemon()
+            grid[int(self.size/2)][int(self.size/2)] = self.current_pokemon
+        self.grid = grid
+        for i, row in enumerate(grid):
+            for j, obj in enumerate(row):
+                if obj in drawn:
+                    self.place(i, j, obj, drawn[obj])
+        self.pokemon_status = 0
+        self.prune()
+        return True
 
     def import_pokemon_list(self, file: str) -> None:
         """
@@ -87,19 +516,36 @@ class Bingo:
             for row in reader:
                 self.pokemon_list.append(row[0])
 
-    def pick_random_pokemon(self) -> str:
+    def pick_random_pokemon(self, rng: Random | None=None, current: str | None=None) -> str:
         """
         Picks a random pokemon from the list, but makes sure its different than the current pokemon.
         """
-        random_poke = self.current_pokemon
-        while random_poke == self.current_pokemon:
-            random_poke = self.pokemon_list[randint(0, len(self.pokemon_list)-1)]
+        rng = rng or self.rng
+        current = self.current_pokemon if current is None else current
+        random_poke = current
+        while random_poke == current:
+            random_poke = self.pokemon_list[rng.randint(0, len(self.pokemon_list)-1)]
         return random_poke
+
+    def peek_pokemon(self, count: int) -> list:
+        """
+        The pokemon the next count random rerolls of the middle square will give, if nothing else uses the rng in between.
+        Works on a copy of the rng, so the board stays reproducible.
+        """
+        rng = Random()
+        rng.setstate(self.rng.getstate())
+        picks = []
+        current = self.current_pokemon
+        for _ in range(count):
+            current = self.pick_random_pokemon(rng, current)
+            picks.append(current)
+        return picks
     
     def shuffle(self) -> None:
         """
         Shuffles the grid, but nothing gets added or deleted. Central pokemon stays.
         """
+        self.history.append(["s"])
         grid_list = []
         for i, row in enumerate(self.grid):
             for j, item in enumerate(row):
@@ -114,28 +560,39 @@ class Bingo:
                 if self.pokemon_bool and i == j and i == int(self.size/2):   # middle square
                     row.append(self.current_pokemon)
                 else:
-                    index = randint(0, len(grid_list)-1)
+                    index = self.rng.randint(0, len(grid_list)-1)
                     row.append(grid_list.pop(index))
             self.grid.append(row)
+        self.log_layout(SHUFFLE)
 
-    def replace(self, i: int, j: int, random: bool, new_goal: str="") -> None:
+    def replace(self, i: int, j: int, random: bool, new_goal: str="", template: str="") -> None:
         """
         Replaces the cell at the given coordinates with either a random other uncompleted objective from the list or a given one. This new one gets added to the list.
+        A given objective made from a template (by another co-op player) passes its template along, so it comes and goes with the board.
         """
+        if random:
+            template = ""
+            self.history.append(["r", i, j])
+        elif new_goal:
+            self.history.append(["r", i, j, new_goal, template] if template else ["r", i, j, new_goal])
         if random:
             if self.pokemon_bool and i == j and i == int(self.size/2):   # middle square
                 self.current_pokemon = self.pick_random_pokemon()
                 new_goal = self.current_pokemon
             else:
-                old_goal = self.grid[i][j]
-                new_goal = old_goal
-                while new_goal == old_goal or self.list[new_goal] == 1:
-                    new_goal = random_choice(list(self.list.keys()))
+                drawn = self.sample_open({obj for row in self.grid for obj in row})
+                if drawn:
+                    new_goal, template = drawn
         if new_goal:
-            if not new_goal in self.list:
+            if self.is_middle(i, j):
+                self.current_pokemon = new_goal
+            elif not new_goal in self.list and not template:
                 # Add goal to list
                 self.list[new_goal] = 0
-            self.grid[i][j] = new_goal
+                self.key_cache = None
+            self.place(i, j, new_goal, template)
+            self.events.record(POKEMON if self.is_middle(i, j) else REPLACE, i*self.size + j, new_goal)
+            self.prune()
 
     def reset(self) -> None:
         """
@@ -143,4 +600,273 @@ class Bingo:
         """
         for key in self.list:
             self.list[key] = 0
-        self.populate()
\ No newline at end of file
+        self.history.append(["x"])
+        self.events.record(RESET)
+        self.populate()
+
+    def set_status(self, objective: str, status: int) -> None:
+        """
+        Sets the completion status of an objective.
+        """
+        if self.list[objective] != status:
+            self.list[objective] = status
+            self.history.append(["t", objective, status])
+            self.events.record(TOGGLE, self.cell_of(objective), objective, status)
+
+    def set_pokemon_status(self, status: int) -> None:
+        if self.pokemon_status != status:
+            self.pokemon_status = status
+            self.events.record(POKEMON_STATUS, int(self.size/2)*(self.size+1), self.current_pokemon, status)
+
+    def undo_to(self, prev):
+        """
+        Returns a copy of the previous bingo state that keeps this bingo's event log, with the undo logged in it.
+        """
+        bingo = deepcopy(prev)
+        bingo.events = self.events
+        # the layout only shows the board, so every status the undo reverts goes along
+        statuses = {obj: prev.list.get(obj, 0) for obj in self.list.keys() | prev.list.keys()
+                    if self.list.get(obj, 0) != prev.list.get(obj, 0)}
+        bingo.log_layout(UNDO, statuses)
+        return bingo
+
+    def set_list(self, obj_list: dict) -> set:
+        """
+        Replaces the objectives list, recording what was added, removed or changed status.
+        Returns the objectives that were touched.
+        """
+        changed = set()
+        for key in list(self.list):
+            if key not in obj_list:
+                self.remove_objective(key)
+                changed.add(key)
+        for key in obj_list:
+            if key not in self.list:
+                self.add_objective(key)
+                changed.add(key)
+            if self.list[key] != obj_list[key]:
+                self.set_status(key, obj_list[key])
+                changed.add(key)
+        return changed
+
+    def add_objective(self, objective: str, template: str="") -> None:
+        if objective not in self.list:
+            self.list[objective] = 0
+            if template:
+                self.expanded[objective] = template
+            self.key_cache = None
+            self.history.append(["a", objective, template] if template else ["a", objective])
+
+    def remove_objective(self, objective: str) -> None:
+        if objective in self.list:
+            self.list.pop(objective)
+            self.expanded.pop(objective, None)
+            self.key_cache = None
+            self.history.append(["d", objective])
+
+    def rename_objective(self, old: str, new: str) -> list:
+        """
+        Renames an objective, keeping its status, weight and category. Returns the cells it's on.
+        """
+        cells = self.cells_of({old})
+        self.list[new] = self.list.pop(old)
+        for attributes in (self.weights, self.categories):
+            if old in attributes:
+                attributes[new] = attributes.pop(old)
+        if old in self.expanded:
+            self.expanded[new] = self.expanded.pop(old)
+        for i, j in cells:
+            self.grid[i][j] = new
+        self.key_cache = None
+        self.history.append(["n", old, new])
+        return cells
+
+    def flag_objective(self, objective: str) -> None:
+        """
+        Marks an objective that's on the board as removed from the list. It stays until it leaves the board.
+        """
+        self.flagged.add(objective)
+        self.key_cache = None
+        self.history.append(["f", objective])
+
+    def unflag_objective(self, objective: str) -> None:
+        """
+        Puts a flagged objective back in the list, e.g. when it comes back to the list file while still on the board.
+        """
+        self.flagged.discard(objective)
+        self.key_cache = None
+        self.history.append(["f", objective, 0])
+
+    def add_template(self, pattern: str, folder: str) -> bool:
+        """
+        Adds a templated objective, loading the values of its placeholders from folder. Returns False if some have no file there.
+        """
+        if not all(self.import_source(name, folder) for name in placeholders(pattern)):
+            return False
+        if pattern not in [template.pattern for template in self.templates]:
+            self.templates.append(Template(pattern, self.template_sources()))
+            self.history.append(["ta", pattern])
+        return True
+
+    def remove_template(self, pattern: str) -> None:
+        """
+        Removes a templated objective. Objectives it already made stay until they leave the board.
+        """
+        self.templates = [template for template in self.templates if template.pattern != pattern]
+        self.history.append(["td", pattern])
+
+    def merge_list(self, added: list, removed: list, renamed: list) -> list:
+        """
+        Merges edits of the linked list file, given as rows split into fields: added rows, removed rows and (old row, new row) renames.
+        Completion states are kept, also across renames. Removed objectives on the board get replaced if the link says so,
+        otherwise flagged. Only the changed entries are touched. Returns the cells that changed.
+        """
+        for row in added + [new for _, new in renamed]:
+            row_weight(row)     # a bad row stops the merge before anything changed
+        added = list(added)
+        removed = list(removed)
+        folder = os_path.dirname(self.link.get("file", self.list_file))
+        patterns = {template.pattern for template in self.templates}
+        cells = []
+        renamed_cells = []
+        for old, new in renamed:
+            if old[0] == new[0] or old[0] not in self.list or new[0] in self.list or new[0] in patterns:
+                removed.append(old)
+                added.append(new)
+            else:
+                renamed_cells += self.rename_objective(old[0], new[0])
+                self.set_attributes(new)
+        kept = {row[0] for row in added}     # rows that only got a new weight or category come back in added
+        for row in removed:
+            objective = row[0]
+            if objective in kept:
+                continue
+            if objective in patterns:
+                self.remove_template(objective)
+                patterns.discard(objective)
+            elif objective in self.list:
+                on_board = self.cells_of({objective})
+                if not on_board:
+                    self.remove_objective(objective)
+                elif self.link.get("replace_removed"):
+                    self.flag_objective(objective)      # keeps it from getting drawn again
+                    for i, j in on_board:
+                        self.replace(i, j, True)
+                    cells += on_board
+                else:
+                    self.flag_objective(objective)
+                    cells += on_board
+                self.update_attributes(objective, None, "")
+        for row in added:
+            if placeholders(row[0]) and self.add_template(row[0], folder):
+                patterns.add(row[0])
+            else:
+                self.add_objective(row[0])
+                if row[0] in self.flagged:
+                    self.unflag_objective(row[0])    # put back in the list while it was still on the board
+                    cells += self.cells_of({row[0]})
+            self.set_attributes(row)
+        if renamed_cells:
+            self.log_layout(RENAME)
+        if "rows" in self.link:
+            rows = self.link["rows"]
+            for row in removed:
+                rows.pop(row[0], None)
+            for row in added:
+                rows[row[0]] = row[1:]
+        return cells + renamed_cells
+
+    def merge_list_file(self, rows: list) -> tuple[bool, list]:
+        """
+        Merges a whole version of the linked list file, compared to the version merged last (kept in the link).
+        This catches up on edits made while the session wasn't open, and leaves objectives added or removed in the app alone.
+        A file that was just linked has no earlier version, so it only adds and updates objectives and removes none. Renames can't
+        be told apart either, so a renamed objective counts as removed and added. Returns whether anything changed and the cells that did.
+        """
+        seen = self.link.get("rows")
+        current = {row[0]: row[1:] for row in rows}
+        if seen is None:
+            own = {objective for objective in self.list if objective not in self.expanded and objective not in self.flagged}
+            own.update(template.pattern for template in self.templates)
+            added = [row for row in rows if row[0] not in own
+                     or self.weights.get(row[0]) != row_weight(row) or self.categories.get(row[0], "") != (row[2].strip() if len(row) > 2 else "")]
+            removed = []
+        else:
+            added = [row for row in rows if seen.get(row[0]) != row[1:]]
+            removed = [[objective] for objective in seen if objective not in current]
+        cells = self.merge_list(added, removed, []) if added or removed else []
+        self.link["rows"] = current
+        return bool(added or removed), cells
+
+    def set_attributes(self, row: list) -> None:
+        """
+        Takes over weight and category from a list row.
+        """
+        self.update_attributes(row[0], row_weight(row), row[2].strip() if len(row) > 2 else "")
+
+    def update_attributes(self, objective: str, weight: float | None, category: str) -> None:
+        """
+        Sets (or with None and "" clears) the weight and category of an objective or template, recording it if anything changed.
+        """
+        if self.weights.get(objective) == weight and self.categories.get(objective, "") == category:
+            return
+        self.weights.pop(objective, None)
+        self.categories.pop(objective, None)
+        if weight is not None:
+            self.weights[objective] = weight
+        if category:
+            self.categories[objective] = category
+        self.history.append(["w", objective, weight, category])
+
+    def mark_cells(self, cells: list, status: int) -> list:
+        """
+        Sets the status of all objectives (and the pokemon) in the given cells. Returns the cells that changed.
+        """
+        changed = []
+        for i, j in cells:
+            if self.is_completed(i, j) != bool(status):
+                if self.is_middle(i, j):
+                    self.set_pokemon_status(status)
+                else:
+                    self.set_status(self.grid[i][j], status)
+                changed.append((i, j))
+        return changed
+
+    def import_statuses(self, file: str) -> set:
+        """
+        Takes over completion states from a file: either a save file, or a list with one completed objective per line.
+        Objectives that aren't in the list are ignored. Returns the objectives that changed.
+        """
+        if file.lower().endswith(".json"):
+            with open(file, "r") as f:
+                statuses = json_load(f)["list"]
+        else:
+            with open(file, "r") as f:
+                statuses = {line.strip(): 1 for line in f if line.strip()}
+        changed = set()
+        for key, status in statuses.items():
+            if key in self.list and self.list[key] != status:
+                self.set_status(key, status)
+                changed.add(key)
+        return changed
+
+    def reroll_uncompleted(self) -> list:
+        """
+        Replaces every uncompleted objective on the board with a random uncompleted one that isn't on the board yet.
+        The pokemon stays. Returns the cells that changed.
+        """
+        self.history.append(["u"])
+        on_board = {obj for row in self.grid for obj in row}
+        changed = []
+        for i in range(self.size):
+            for j in range(self.size):
+                if not self.is_middle(i, j) and not self.is_completed(i, j):
+                    drawn = self.sample_open(on_board)
+                    if drawn is None:
+                        break
+                    self.place(i, j, *drawn)
+                    on_board.add(drawn[0])
+                    self.events.record(REPLACE, i*self.size + j, self.grid[i][j])
+                    changed.append((i, j))
+        self.prune()
+        return changed
\ No newline at end of file
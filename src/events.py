@@ -0,0 +1,92 @@
+from array import array
+from base64 import b64decode, b64encode
+from sys import byteorder
+from time import time
+
+TOGGLE = 0
+REPLACE = 1
+SHUFFLE = 2
+POPULATE = 3
+POKEMON = 4
+POKEMON_STATUS = 5
+RESET = 6
+UNDO = 7
+RENAME = 8
+
+KIND_NAMES = ["toggle", "replace", "shuffle", "populate", "pokemon", "pokemon status", "reset", "undo", "rename"]
+
+COLUMNS = {"t": 'd', "kind": 'B', "cell": 'h', "obj": 'i', "value": 'i'}
+
+class EventLog:
+    """
+    Append-only log of timestamped board actions, stored column by column.
+    Objective (and pokemon) names are interned, so an event is 19 bytes no matter how long the objective is.
+    Whole-board changes (populate, shuffle, undo, rename) point to a layout: the grid as name ids plus a bitmask of completed cells.
+    An undo's layout also lists the [name id, status] pairs that changed anywhere in the list, since it can revert statuses off the board.
+    """
+    def __init__(self):
+        self.columns = {name: array(code) for name, code in COLUMNS.items()}
+        self.names = []
+        self.ids = {}
+        self.layouts = []
+
+    @classmethod
+    def fromDict(cls, data: dict):
+        log = cls()
+        log.names = data["names"]
+        log.ids = {name: i for i, name in enumerate(log.names)}
+        log.layouts = data["layouts"]
+        for name, code in COLUMNS.items():
+            column = array(code)
+            column.frombytes(b64decode(data[name]))
+            if byteorder == "big":
+                column.byteswap()
+            log.columns[name] = column
+        return log
+
+    def toDict(self) -> dict:
+        data = {"names": self.names, "layouts": self.layouts}
+        for name, column in self.columns.items():
+            if byteorder == "big":
+                column = array(column.typecode, column)
+                column.byteswap()
+            data[name] = b64encode(column.tobytes()).decode()
+        return data
+
+    def copy(self):
+        log = EventLog()
+        log.columns = {name: array(column.typecode, column) for name, column in self.columns.items()}
+        log.names = self.names.copy()
+        log.ids = self.ids.copy()
+        log.layouts = self.layouts.copy()
+        return log
+
+    def __len__(self) -> int:
+        return len(self.columns["t"])
+
+    def intern(self, name: str) -> int:
+        if name not in self.ids:
+            self.ids[name] = len(self.names)
+            self.names.append(name)
+        return self.ids[name]
+
+    def record(self, kind: int, cell: int=-1, obj: str | None=None, value: int=0) -> None:
+        self.columns["t"].append(time())
+        self.columns["kind"].append(kind)
+        self.columns["cell"].append(cell)
+        self.columns["obj"].append(-1 if obj is None else self.intern(obj))
+        self.columns["value"].append(value)
+
+    def record_layout(self, kind: int, grid: list, completed: list, statuses: dict | None=None) -> None:
+        """
+        Records a whole-board change. completed holds one bool per cell, row by row; statuses are changes of the list, if any.
+        """
+        mask = 0
+        for n, done in enumerate(completed):
+            if done:
+                mask |= 1 << n
+        layout = [[self.intern(obj) for row in grid for obj in row], mask]
+        if statuses:
+            layout.append([[self.intern(obj), status] for obj, status in statuses.items()])
+        self.layouts.append(layout)
+        self.record(kind, value=len(self.layouts)-1)
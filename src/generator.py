@@ -0,0 +1,142 @@
+from bisect import bisect_left, bisect_right
+from collections import Counter
+import random as random_module
+from time import perf_counter
+
+def cap_feasible(size: int, middle: bool, categories: list, category_cap: int) -> bool:
+    """
+    Quick check whether a category cap leaves enough objectives to fill the grid: a line can hold at most category_cap
+    of each category and a category can't fill more than category_cap cells per row. Uncategorized ones ("") have no cap.
+    """
+    if not category_cap:
+        return True
+    counts = Counter(categories)
+    free = counts.pop("", 0)
+    cells = size*size - (1 if middle else 0)
+    longest = min(size, cells)
+    return (free + sum(min(category_cap, n) for n in counts.values()) >= longest
+            and free + sum(min(category_cap * size, n) for n in counts.values()) >= cells)
+
+def balanced_grid(size: int, middle: bool, pool: list, weight, category, lines: list, tolerance: float=0.15,
+                  category_cap: int=0, time_budget: float=0.5, rng=random_module, candidates: int=40) -> list | None:
+    """
+    Fills a size x size grid with distinct objectives from the pool so that every line lands within tolerance
+    (a fraction of the line's target difficulty) and no category shows up more than category_cap times on a line.
+    The middle square is left as None if middle is True. Runs a backtracking search with restarts and returns None
+    if the cap can't be met by the pool or no grid was found within time_budget seconds.
+    """
+    cells = [(i, j) for i in range(size) for j in range(size) if not (middle and i == j and i == int(size/2))]
+    if len(pool) < len(cells):
+        return None
+    categories = [category(obj) for obj in pool]
+    if not cap_feasible(size, middle, categories, category_cap):
+        return None     # no point searching until the deadline
+
+    # which lines go through which cell
+    cell_lines = {cell: [] for cell in cells}
+    line_length = []
+    for n, line in enumerate(lines):
+        members = [cell for cell in line if cell in cell_lines]
+        for cell in members:
+            cell_lines[cell].append(n)
+        line_length.append(len(members))
+
+    weights = [weight(obj) for obj in pool]
+    by_weight = sorted(range(len(pool)), key=lambda idx: weights[idx])
+    sorted_weights = [weights[idx] for idx in by_weight]
+    mean = sum(weights) / len(weights)
+    w_min = min(weights)
+    w_max = max(weights)
+    spread = (w_max - w_min) or 1.0
+    low = []
+    high = []
+    for length in line_length:
+        target = mean * length
+        margin = tolerance * target if target else tolerance
+        low.append(target - margin)
+        high.append(target + margin)
+
+    deadline = perf_counter() + time_budget
+    node_limit = 50 * len(cells)
+    while perf_counter() < deadline:
+        # most constrained cells (the ones on diagonals) first, random order otherwise
+        order = cells.copy()
+        rng.shuffle(order)
+        order.sort(key=lambda cell: -len(cell_lines[cell]))
+
+        sums = [0.0] * len(lines)
+        left = line_length.copy()
+        cat_counts = [{} for _ in lines]
+        used = set()
+        placed = {}
+        nodes = [0]
+
+        def allowed(cell: tuple) -> tuple:
+            """
+            Weight interval a cell can take so all of its lines can still end up in range,
+            and the weight that would keep its lines closest to their targets.
+            """
+            lo = w_min
+            hi = w_max
+            ideal = 0.0
+            for n in cell_lines[cell]:
+                r = left[n] - 1
+                lo = max(lo, low[n] - sums[n] - r * w_max)
+                hi = min(hi, high[n] - sums[n] - r * w_min)
+                ideal += ((low[n] + high[n]) / 2 - sums[n]) / left[n]
+            return lo, hi, ideal / len(cell_lines[cell])
+
+        def fits(idx: int, cell: tuple) -> bool:
+            if category_cap and categories[idx]:
+                for n in cell_lines[cell]:
+                    if cat_counts[n].get(categories[idx], 0) >= category_cap:
+                        return False
+            return True
+
+        def headroom(idx: int, cell: tuple) -> float:
+            """
+            Share of the open cells on the cell's lines that the candidate's category could still take (1 if uncapped).
+            Prefers categories that aren't running into their cap, so a dominant one doesn't use up the lines early.
+            """
+            if not (category_cap and categories[idx]):
+                return 1.0
+            return min(min(1.0, (category_cap - cat_counts[n].get(categories[idx], 0)) / left[n]) for n in cell_lines[cell])
+
+        def place(idx: int, cell: tuple, sign: int) -> None:
+            for n in cell_lines[cell]:
+                sums[n] += sign * weights[idx]
+                left[n] -= sign
+                if categories[idx]:
+                    cat_counts[n][categories[idx]] = cat_counts[n].get(categories[idx], 0) + sign
+
+        def search(depth: int) -> bool:
+            if depth == len(order):
+                return True
+            nodes[0] += 1
+            if nodes[0] > node_limit or perf_counter() > deadline:
+                return False
+            cell = order[depth]
+            lo, hi, ideal = allowed(cell)
+            start = bisect_left(sorted_weights, lo - 1e-9)
+            end = bisect_right(sorted_weights, hi + 1e-9)
+            # over-sample, so a category that's at its cap on these lines can't crowd out the candidates that fit
+            options = [by_weight[pos] for pos in rng.sample(range(start, end), min(4 * candidates, max(end - start, 0)))]
+            options = [idx for idx in options if idx not in used and fits(idx, cell)][:candidates]
+            options.sort(key=lambda idx: abs(weights[idx] - ideal) / spread - headroom(idx, cell))
+            for idx in options:
+                used.add(idx)
+                place(idx, cell, 1)
+                placed[cell] = idx
+                if search(depth + 1):
+                    return True
+                used.discard(idx)
+                place(idx, cell, -1)
+                placed.pop(cell)
+                if nodes[0] > node_limit:
+                    return False
+            return False
+
+        if search(0):
+            return [[pool[placed[(i, j)]] if (i, j) in placed else None for j in range(size)] for i in range(size)]
+        node_limit = int(node_limit * 1.5)
+    return None
@@ -0,0 +1,138 @@
+from json import dump as json_dump, dumps as json_dumps, load as json_load, loads as json_loads
+from os import listdir, path as os_path, stat
+
+from bingo import Bingo
+
+HEADER_START = '{"header": '
+INDEX_FILE = "resources/library.json"
+
+def header_of(data: dict) -> dict:
+    """
+    The metadata the library shows for a save: board size, pokemon mode, progress and a thumbnail.
+    cells has one character per cell, row by row: 1 for completed, 0 for open.
+    """
+    size = int(data["size"])
+    pokemon = data["pokemon"]
+    obj_list = data["list"]
+    middle = int(size/2) if pokemon else -1
+    done = [[data["pokemon_status"] == 1 if i == j == middle else obj_list.get(obj, 0) == 1 for j, obj in enumerate(row)]
+            for i, row in enumerate(data["grid"])]
+    cells = "".join("1" if d else "0" for row in done for d in row)
+    lines = sum(all(done[i][j] for i, j in line) for line in Bingo(size, pokemon, active=False).lines()) if cells else 0
+    return {"size": size,
+            "pokemon": pokemon,
+            "completion": round(100 * cells.count("1") / len(cells)) if cells else 0,
+            "lines": lines,
+            "completed": sum(1 for status in obj_list.values() if status == 1),
+            "objectives": len(obj_list),
+            "cells": cells}
+
+def write_save(file: str, data: dict, header: dict | None=None) -> None:
+    """
+    Writes a save file with its header on the first line, so the library can read it without parsing the rest.
+    The file is still plain JSON; the header is just its first key.
+    """
+    header = header or header_of(data)
+    body = json_dumps(data, indent=1)
+    with open(file, "w") as f:
+        f.write(HEADER_START + json_dumps(header, separators=(",", ":")) + ",\n" + body[1:].lstrip("\n"))
+
+def read_header(file: str) -> dict:
+    """
+    Header of a save file. Older saves don't have one, so those get parsed in full once.
+    """
+    with open(file, "r") as f:
+        first = f.readline()
+        if first.startswith(HEADER_START) and first.endswith(",\n"):
+            return json_loads(first[len(HEADER_START):-2])
+        f.seek(0)
+        return header_of(json_load(f))
+
+def read_save(file: str, header: dict | None=None) -> dict:
+    """
+    Reads a whole save file. If the header was already parsed, its line gets skipped and the header reused.
+    """
+    with open(file, "r") as f:
+        if header is not None:
+            first = f.readline()
+            if first.startswith(HEADER_START) and first.endswith(",\n"):
+                data = json_loads("{" + f.read())
+                data["header"] = header
+                return data
+            f.seek(0)
+        return json_load(f)
+
+class Library:
+    """
+    Index of save files with their headers, keyed by path and checked against the file's mtime and size.
+    Listing only stats the files; a header only gets read again when its file changed.
+    """
+    def __init__(self, index_file: str=INDEX_FILE):
+        self.index_file = index_file
+        self.folders = []
+        self.entries = {}
+        try:
+            with open(index_file, "r") as f:
+                data = json_load(f)
+            self.folders = data["folders"]
+            self.entries = data["entries"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def store(self) -> None:
+        try:
+            with open(self.index_file, "w") as f:
+                json_dump({"folders": self.folders, "entries": self.entries}, f)
+        except OSError:
+            pass
+
+    def add_folder(self, folder: str) -> None:
+        folder = os_path.abspath(folder)
+        if folder not in self.folders:
+            self.folders.append(folder)
+
+    def put(self, file: str, header: dict | None) -> None:
+        """
+        Records the header of a file that was just written or read, so it doesn't get read again.
+        """
+        file = os_path.abspath(file)
+        try:
+            st = stat(file)
+        except OSError:
+            return
+        self.entries[file] = {"mtime": st.st_mtime_ns, "bytes": st.st_size, "header": header}
+
+    def remove(self, file: str) -> None:
+        self.entries[os_path.abspath(file)] = {"mtime": 0, "bytes": 0, "header": None, "hidden": True}
+
+    def refresh(self) -> list:
+        """
+        Brings the index up to date with the files on disk. Returns (path, mtime in seconds, header) of every save, newest first.
+        JSON files that aren't saves stay in the index with an empty header, so they don't get parsed on every refresh either.
+        """
+        files = {file for file, entry in self.entries.items() if not entry.get("hidden")}
+        for folder in self.folders:
+            try:
+                files.update(os_path.join(folder, name) for name in listdir(folder) if name.lower().endswith(".json"))
+            except OSError:
+                pass
+        saves = []
+        for file in files:
+            try:
+                st = stat(file)
+            except OSError:
+                self.entries.pop(file, None)
+                continue
+            entry = self.entries.get(file)
+            if entry and entry.get("hidden"):
+                continue
+            if not entry or entry["mtime"] != st.st_mtime_ns or entry["bytes"] != st.st_size:
+                try:
+                    header = read_header(file)
+                except (OSError, ValueError, KeyError, TypeError, AttributeError):
+                    header = None
+                entry = self.entries[file] = {"mtime": st.st_mtime_ns, "bytes": st.st_size, "header": header}
+            if entry["header"]:
+                saves.append((file, entry["mtime"] / 1e9, entry["header"]))
+        saves.sort(key=lambda save: save[1], reverse=True)
+        return saves
@@ -0,0 +1,249 @@
+"""
+Monte Carlo analysis of how long a board will take: time to the first line, time to a blackout and which cells hold things up.
+
+Every open cell gets a random completion time around its estimate (gamma distributed, so the variability can be tuned).
+In parallel mode the cells progress independently, like a team splitting the board; in sequential mode one runner
+does the open cells in a random order, so a cell is done at the sum of everything done before it.
+
+Run it from the repository root, e.g.:
+    python src/montecarlo.py marathon.json --hours 12 --simulations 1000000 --workers 4
+"""
+from argparse import ArgumentParser
+from csv import reader as csv_reader
+from json import load as json_load
+from math import inf, isfinite, log
+from multiprocessing import Pool
+from sys import exit
+
+import numpy as np
+
+from analytics import duration, line_name
+from bingo import Bingo
+
+CHUNK = 100000
+BINS = 4096     # log-spaced histogram bins for first line and blackout times; well under 1% apart
+
+def means_from_probabilities(probabilities: dict, hours: float) -> dict:
+    """
+    Turns chances of getting an objective done within the given hours into mean completion times (exponential model).
+    """
+    means = {}
+    for objective, p in probabilities.items():
+        if p <= 0:
+            means[objective] = inf
+        elif p >= 1:
+            means[objective] = 0.0
+        else:
+            means[objective] = -hours / log(1 - p)
+    return means
+
+def read_estimates(file: str) -> dict:
+    """
+    Reads "objectiveµvalue" lines, the same format as the objectives list.
+    """
+    with open(file, "r") as f:
+        return {row[0]: float(row[1]) for row in csv_reader(f, delimiter='µ') if len(row) > 1 and row[1].strip()}
+
+def board_model(bingo: Bingo, hours_per_weight: float=1.0, estimates: dict | None=None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Mean hours per cell (row by row) and which cells are already done.
+    Cells without an estimate take their weight times hours_per_weight. The pokemon can be estimated under its name or "pokemon".
+    """
+    estimates = estimates or {}
+    means = np.zeros(bingo.size**2)
+    done = np.zeros(bingo.size**2, dtype=bool)
+    for i, row in enumerate(bingo.grid):
+        for j, obj in enumerate(row):
+            n = i*bingo.size + j
+            done[n] = bingo.is_completed(i, j)
+            if bingo.is_middle(i, j):
+                means[n] = estimates.get(obj, estimates.get("pokemon", hours_per_weight))
+            else:
+                means[n] = estimates.get(obj, bingo.weight(obj) * hours_per_weight)
+    means[done] = 0
+    return means, done
+
+def time_bins(means: np.ndarray) -> np.ndarray:
+    """
+    Histogram edges wide enough for any first line or blackout time these means can give.
+    """
+    open_means = means[np.isfinite(means) & (means > 0)]
+    if not len(open_means):
+        return np.geomspace(1, 2, BINS + 1)
+    return np.geomspace(open_means.min() * 1e-6, open_means.sum() * 100, BINS + 1)
+
+def summarize(times: np.ndarray, edges: np.ndarray) -> dict:
+    """
+    Histogram of a batch of times, with the ones that are 0 (already done) or never happen counted apart.
+    """
+    finite = times[np.isfinite(times)]
+    positive = finite[finite > 0]
+    return {"zero": len(finite) - len(positive),
+            "never": len(times) - len(finite),
+            "total": float(positive.sum(dtype=np.float64)),
+            "histogram": np.histogram(np.clip(positive, edges[0], edges[-1]), edges)[0]}
+
+def merge(summaries: list) -> dict:
+    return {key: sum(summary[key] for summary in summaries) for key in summaries[0]}
+
+def percentile(summary: dict, edges: np.ndarray, q: float) -> float:
+    """
+    The time q% of the simulations were done by, read off the histogram (log-interpolated within a bin).
+    """
+    histogram = summary["histogram"]
+    target = q / 100 * (summary["zero"] + histogram.sum() + summary["never"])
+    if target <= summary["zero"]:
+        return 0.0
+    cumulative = np.cumsum(histogram) + summary["zero"]
+    if target > cumulative[-1]:
+        return inf
+    k = int(np.searchsorted(cumulative, target))
+    fraction = (target - (cumulative[k] - histogram[k])) / histogram[k]
+    return float(edges[k] * (edges[k+1] / edges[k]) ** fraction)
+
+def chance_within(summary: dict, edges: np.ndarray, horizon: float) -> float:
+    histogram = summary["histogram"]
+    total = summary["zero"] + histogram.sum() + summary["never"]
+    if horizon <= 0:
+        return summary["zero"] / total
+    k = int(np.searchsorted(edges, horizon, side="right")) - 1
+    below = summary["zero"] + histogram[:max(k, 0)].sum()
+    if 0 <= k < len(histogram):
+        below += histogram[k] * log(horizon / edges[k]) / log(edges[k+1] / edges[k])
+    elif k >= len(histogram):
+        below += histogram[-1]
+    return float(below / total)
+
+def simulate(means: np.ndarray, lines: np.ndarray, edges: np.ndarray, count: int, cv: float, sequential: bool, seed) -> dict:
+    """
+    One batch of simulations. Returns histograms of the first line and blackout times and how often each cell or line
+    was the deciding one; only these small totals go back from a worker process.
+    """
+    rng = np.random.default_rng(seed)
+    cells = len(means)
+    scale = means.astype(np.float32)
+    never = np.isinf(scale)     # chance 0; scaling a draw of 0 would give NaN instead
+    scale[never] = 0
+    if cv == 1:
+        times = rng.standard_exponential((count, cells), dtype=np.float32)
+    else:
+        shape = 1 / cv**2
+        times = rng.standard_gamma(shape, (count, cells), dtype=np.float32) / np.float32(shape)
+    times *= scale
+    times[:, never] = np.inf
+    if sequential:
+        # a random order of work per simulation; each cell is done once everything before it is.
+        # Cells that never get done come last, nobody keeps at them while there's other work.
+        keys = rng.random((count, cells), dtype=np.float32)
+        keys[:, never] += 1
+        order = np.argsort(keys, axis=1)
+        finished = np.cumsum(np.take_along_axis(times, order, axis=1), axis=1)
+        np.put_along_axis(times, order, finished, axis=1)
+        times[:, means == 0] = 0
+
+    line_times = np.empty((count, len(lines)), dtype=np.float32)
+    line_last = np.empty((count, len(lines)), dtype=np.intp)
+    for n, line in enumerate(lines):
+        on_line = times[:, line]
+        line_last[:, n] = line[on_line.argmax(axis=1)]
+        line_times[:, n] = on_line.max(axis=1)
+    first_line = line_times.argmin(axis=1)
+    everything = np.arange(count)
+    return {"first_line": summarize(line_times[everything, first_line], edges),
+            "blackout": summarize(times.max(axis=1), edges),
+            "line_critical": np.bincount(line_last[everything, first_line], minlength=cells),
+            "blackout_critical": np.bincount(times.argmax(axis=1), minlength=cells),
+            "first_lines": np.bincount(first_line, minlength=len(lines))}
+
+def analyze(bingo: Bingo, simulations: int=1000000, hours_per_weight: float=1.0, estimates: dict | None=None,
+            cv: float=1.0, sequential: bool=False, workers: int=1, seed: int | None=None) -> dict:
+    """
+    Runs the simulations in batches, spread over worker processes if workers > 1. The same seed gives the same result
+    no matter how many workers there are.
+    """
+    means, done = board_model(bingo, hours_per_weight, estimates)
+    lines = np.array([[i*bingo.size + j for i, j in line] for line in bingo.lines()])
+    edges = time_bins(means)
+    counts = [min(CHUNK, simulations - start) for start in range(0, simulations, CHUNK)]
+    seeds = np.random.SeedSequence(seed).spawn(len(counts))
+    jobs = [(means, lines, edges, count, cv, sequential, s) for count, s in zip(counts, seeds)]
+    if workers > 1:
+        with Pool(workers) as pool:
+            batches = pool.starmap(simulate, jobs)
+    else:
+        batches = [simulate(*job) for job in jobs]
+    return {"size": bingo.size,
+            "grid": [obj for row in bingo.grid for obj in row],
+            "means": means,
+            "done": done,
+            "simulations": simulations,
+            "edges": edges,
+            "first_line": merge([batch["first_line"] for batch in batches]),
+            "blackout": merge([batch["blackout"] for batch in batches]),
+            "line_critical": sum(batch["line_critical"] for batch in batches) / simulations,
+            "blackout_critical": sum(batch["blackout_critical"] for batch in batches) / simulations,
+            "first_lines": sum(batch["first_lines"] for batch in batches) / simulations}
+
+def hours(value: float) -> str:
+    return duration(value * 3600) if isfinite(value) else "never"
+
+def report(result: dict, horizon: float | None=None) -> str:
+    """
+    Readable summary of an analysis. horizon (in hours) adds the chance of a line and a blackout within that time.
+    """
+    size = result["size"]
+    lines = [str(result["simulations"]) + " simulations", ""]
+    edges = result["edges"]
+    for name, summary in (("First line", result["first_line"]), ("Blackout", result["blackout"])):
+        p10, p50, p90 = (percentile(summary, edges, q) for q in (10, 50, 90))
+        mean = summary["total"] / result["simulations"] if not summary["never"] else inf
+        lines.append("{}: mean {}, median {}, 10%-90% {} - {}".format(name, hours(mean), hours(p50), hours(p10), hours(p90)))
+        if horizon is not None:
+            lines.append("  chance within {}: {:.1f}%".format(hours(horizon), 100 * chance_within(summary, edges, horizon)))
+    lines.append("")
+    lines.append("Deciding cell of the first line / of the blackout (% of simulations):")
+    cells = [(result["line_critical"][n], result["blackout_critical"][n], n) for n in range(size*size)]
+    for line_share, blackout_share, n in sorted(cells, reverse=True):
+        if result["done"][n]:
+            continue
+        lines.append("  {:5.1f}%  {:5.1f}%  ({},{}) {:>7}  {}".format(100 * line_share, 100 * blackout_share, n // size + 1, n % size + 1,
+                                                                   hours(result["means"][n]), result["grid"][n]))
+    lines.append("")
+    lines.append("Line finished first (% of simulations):")
+    for n in np.argsort(-result["first_lines"]):
+        if result["first_lines"][n]:
+            lines.append("  {:5.1f}%  {}".format(100 * result["first_lines"][n], line_name(int(n), size)))
+    return "\n".join(lines)
+
+def main() -> int:
+    parser = ArgumentParser(description="Monte Carlo analysis of a Bearathon bingo save file.")
+    parser.add_argument("save_file")
+    parser.add_argument("--simulations", type=int, default=1000000)
+    parser.add_argument("--hours-per-weight", type=float, default=1.0, help="mean hours for an objective of weight 1")
+    parser.add_argument("--estimates", help="file with 'objectiveµhours' lines; overrides the weights")
+    parser.add_argument("--probabilities", action="store_true",
+                        help="the estimates file holds chances of completion within --hours instead of hours")
+    parser.add_argument("--cv", type=float, default=1.0, help="variability of completion times (1 = exponential)")
+    parser.add_argument("--sequential", action="store_true", help="one runner doing one objective at a time")
+    parser.add_argument("--hours", type=float, help="report the chance of a line and a blackout within this many hours")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    if args.probabilities and args.hours is None:
+        parser.error("--probabilities needs --hours")
+
+    with open(args.save_file, "r") as f:
+        data = json_load(f)
+    bingo = Bingo.fromSave(int(data["size"]), data["pokemon"], data["grid"], data["list"], data["current_pokemon"], data["pokemon_status"],
+                           active=False, weights=data.get("weights"), categories=data.get("categories"), expanded=data.get("expanded"))
+    estimates = None
+    if args.estimates:
+        estimates = read_estimates(args.estimates)
+        if args.probabilities:
+            estimates = means_from_probabilities(estimates, args.hours)
+    result = analyze(bingo, args.simulations, args.hours_per_weight, estimates, args.cv, args.sequential, args.workers, args.seed)
+    print(report(result, args.hours))
+    return 0
+
+if __name__ == "__main__":
+    exit(main())
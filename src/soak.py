@@ -0,0 +1,273 @@
+"""
+Soak test: replays a long random (or recorded) sequence of actions against a Bingo or the full App and reports
+latency per action, memory growth and widget counts over time. Exits with 1 if growth goes over budget.
+
+Run it from the repository root, e.g.:
+    python src/soak.py --list objectives.csv --target app --actions 20000 --max-rss-growth 50
+"""
+from argparse import ArgumentParser
+from copy import deepcopy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from json import dumps as json_dumps, loads as json_loads
+from os import environ, path as os_path
+from random import Random
+from sys import exit
+from tempfile import TemporaryDirectory
+from threading import Thread
+from time import perf_counter
+import tracemalloc
+
+from bingo import Bingo
+
+ACTIONS = {"toggle": 70, "replace": 8, "new_pokemon": 4, "shuffle": 5, "wipe": 2, "undo": 10, "reset": 1}
+
+def rss_bytes() -> int | None:
+    """
+    Resident memory of this process, or None if it can't be read on this platform.
+    """
+    try:
+        from psutil import Process
+        return Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        from os import sysconf
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+def random_actions(count: int, size: int, seed: int) -> list:
+    """
+    A random action sequence, weighted roughly like a real marathon: mostly ticking objectives.
+    """
+    rng = Random(seed)
+    names = list(ACTIONS)
+    weights = list(ACTIONS.values())
+    actions = []
+    for _ in range(count):
+        action = {"action": rng.choices(names, weights)[0]}
+        if action["action"] in ("toggle", "replace"):
+            action["cell"] = [rng.randrange(size), rng.randrange(size)]
+        actions.append(action)
+    return actions
+
+def percentile(values: list, p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values)-1, int(p / 100 * len(values)))]
+
+class BingoDriver:
+    """
+    Drives a Bingo the way the App does, including the undo snapshot before every undoable action.
+    """
+    def __init__(self, bingo: Bingo):
+        self.bingo = bingo
+        self.prev_bingo = deepcopy(bingo)
+
+    def middle(self, i: int, j: int) -> bool:
+        return self.bingo.is_middle(i, j)
+
+    def run(self, action: dict) -> None:
+        name = action["action"]
+        if name == "toggle":
+            i, j = action["cell"]
+            if self.middle(i, j):
+                self.bingo.set_pokemon_status(1 - self.bingo.pokemon_status)
+            else:
+                goal = self.bingo.grid[i][j]
+                self.bingo.set_status(goal, 1 - self.bingo.list[goal])
+        elif name == "undo":
+            if self.prev_bingo.active:
+                self.bingo = self.bingo.undo_to(self.prev_bingo)
+        else:
+            self.prev_bingo = deepcopy(self.bingo)
+            if name == "replace":
+                i, j = action["cell"]
+                if not self.middle(i, j):
+                    self.bingo.replace(i, j, True)
+            elif name == "new_pokemon":
+                if self.bingo.pokemon_bool:
+                    mid = int(self.bingo.size/2)
+                    self.bingo.replace(mid, mid, True)
+            elif name == "shuffle":
+                self.bingo.shuffle()
+            elif name == "wipe":
+                self.bingo.populate()
+            elif name == "reset":
+                self.bingo.reset()
+
+    def widgets(self) -> int | None:
+        return None
+
+class AppDriver:
+    """
+    Drives the real App offscreen through the same entry points the toolbar and board use.
+    """
+    def __init__(self, bingo: Bingo, save_file: str, sprite_url: str):
+        environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        from PySide6.QtCore import QEvent
+        from PySide6.QtWidgets import QApplication, QMessageBox
+        from ui import App
+
+        self.qapp = QApplication.instance() or QApplication([])
+        self.deferred_delete = QEvent.Type.DeferredDelete
+        QMessageBox.exec = lambda self: QMessageBox.StandardButton.Yes    # nobody is there to click the dialogs
+        App.sprite_url = sprite_url
+        self.app = App()
+        self.app.startBingo(bingo, save_file)
+        self.qapp.processEvents()
+
+    def run(self, action: dict) -> None:
+        app = self.app
+        name = action["action"]
+        mid = int(app.bingo.size/2)
+        if name == "toggle":
+            i, j = action["cell"]
+            app.bingo_squares[i][j].click()
+        elif name == "replace":
+            i, j = action["cell"]
+            if not app.bingo.is_middle(i, j):
+                app.replaceSquare(i, j, True)
+        elif name == "new_pokemon":
+            if app.bingo.pokemon_bool:
+                app.replaceSquare(mid, mid, True)
+        elif name == "shuffle":
+            app.toolShuffle()
+        elif name == "wipe":
+            app.wipeBoard()
+        elif name == "reset":
+            app.resetBoard()
+        elif name == "undo":
+            app.editUndo()
+        self.qapp.processEvents()
+        self.qapp.sendPostedEvents(None, self.deferred_delete)   # processEvents leaves deleteLater to the event loop
+
+    def widgets(self) -> int | None:
+        return len(self.qapp.allWidgets())
+
+class SpriteServer:
+    """
+    Local HTTP server that answers every sprite request with the same small png.
+    """
+    def __init__(self):
+        from PIL import Image
+        buffer = BytesIO()
+        Image.new("RGBA", (64, 64), (200, 120, 40, 255)).save(buffer, "PNG")
+        png = buffer.getvalue()
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header("Content-Type", "image/png")
+                self.send_header("Content-Length", str(len(png)))
+                self.end_headers()
+                self.wfile.write(png)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = "http://127.0.0.1:" + str(self.server.server_address[1]) + "/"
+        Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self) -> None:
+        self.server.shutdown()
+
+def soak(driver, actions: list, sample_every: int=100, trace: bool=True) -> dict:
+    """
+    Runs the actions and returns latencies per action and the memory/widget samples taken along the way.
+    """
+    latencies = {}
+    samples = []
+    if trace:
+        tracemalloc.start()
+    for n, action in enumerate(actions):
+        start = perf_counter()
+        driver.run(action)
+        latencies.setdefault(action["action"], []).append(perf_counter() - start)
+        if n % sample_every == 0 or n == len(actions)-1:
+            samples.append({"action": n,
+                            "rss": rss_bytes(),
+                            "heap": tracemalloc.get_traced_memory()[0] if trace else None,
+                            "widgets": driver.widgets()})
+    if trace:
+        tracemalloc.stop()
+    return {"latencies": latencies, "samples": samples}
+
+def growth(samples: list, key: str) -> float | None:
+    """
+    Growth between the sample after warm-up (10% in) and the last one.
+    """
+    values = [sample[key] for sample in samples if sample[key] is not None]
+    if len(values) < 2:
+        return None
+    return values[-1] - values[len(values) // 10]
+
+def report(result: dict) -> str:
+    lines = ["action          count     p50 ms     p95 ms     p99 ms     max ms"]
+    for name, values in sorted(result["latencies"].items()):
+        lines.append("{:<12}{:>9}{:>11.2f}{:>11.2f}{:>11.2f}{:>11.2f}".format(
+            name, len(values), percentile(values, 50)*1000, percentile(values, 95)*1000,
+            percentile(values, 99)*1000, max(values)*1000))
+    lines.append("")
+    lines.append("  action        rss MB    heap MB   widgets")
+    for sample in result["samples"]:
+        lines.append("{:>8}{:>14}{:>11}{:>10}".format(
+            sample["action"],
+            "n/a" if sample["rss"] is None else "{:.1f}".format(sample["rss"] / 2**20),
+            "n/a" if sample["heap"] is None else "{:.1f}".format(sample["heap"] / 2**20),
+            "n/a" if sample["widgets"] is None else sample["widgets"]))
+    return "\n".join(lines)
+
+def main() -> int:
+    parser = ArgumentParser(description="Soak test for Bearathon bingo.")
+    parser.add_argument("--list", required=True, help="objectives list file")
+    parser.add_argument("--target", choices=["bingo", "app"], default="bingo")
+    parser.add_argument("--size", type=int, default=5)
+    parser.add_argument("--no-pokemon", action="store_true")
+    parser.add_argument("--actions", type=int, default=5000, help="number of random actions")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--replay", help="JSON lines file with a recorded action sequence")
+    parser.add_argument("--record", help="write the action sequence to this file")
+    parser.add_argument("--sample-every", type=int, default=100)
+    parser.add_argument("--no-tracemalloc", action="store_true", help="faster, but no heap numbers")
+    parser.add_argument("--max-rss-growth", type=float, help="budget in MB")
+    parser.add_argument("--max-heap-growth", type=float, help="budget in MB")
+    parser.add_argument("--max-widget-growth", type=int, help="budget in widgets")
+    args = parser.parse_args()
+
+    if args.replay:
+        with open(args.replay, "r") as f:
+            actions = [json_loads(line) for line in f if line.strip()]
+    else:
+        actions = random_actions(args.actions, args.size, args.seed)
+    if args.record:
+        with open(args.record, "w") as f:
+            f.write("\n".join(json_dumps(action) for action in actions))
+
+    bingo = Bingo(args.size, not args.no_pokemon, list_file=args.list, seed=args.seed)
+    with TemporaryDirectory() as tmp:
+        if args.target == "app":
+            server = SpriteServer()
+            driver = AppDriver(bingo, os_path.join(tmp, "soak.json"), server.url)
+        else:
+            server = None
+            driver = BingoDriver(bingo)
+        result = soak(driver, actions, args.sample_every, not args.no_tracemalloc)
+        if server:
+            server.close()
+    print(report(result))
+
+    failed = False
+    for key, budget, scale, unit in (("rss", args.max_rss_growth, 2**20, "MB"),
+                                     ("heap", args.max_heap_growth, 2**20, "MB"),
+                                     ("widgets", args.max_widget_growth, 1, "widgets")):
+        grown = growth(result["samples"], key)
+        if budget is not None and grown is not None and grown / scale > budget:
+            print("FAIL: {} grew by {:.1f} {} (budget {} {})".format(key, grown / scale, unit, budget, unit))
+            failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,460 @@
+"""
+Co-op sync: one App hosts a board, others join over the local network.
+
+Every change travels as a small list of absolute deltas ("this cell now holds X", "X is now completed").
+The host numbers them in the order it receives them and sends each numbered batch to every peer, including the one that
+made it. Peers apply their own changes right away and then everything in the host's order, so all boards end up the same.
+An echoed change of our own is skipped where a newer one of ours is still on its way, so it can't undo that one for a moment.
+A peer that (re)joins gets the deltas it missed, or a snapshot if it was gone for too long.
+
+Run `python src/sync.py bench` from the repository root to measure sync latency with a few local processes.
+"""
+from argparse import ArgumentParser
+from collections import deque
+from copy import deepcopy
+from hashlib import sha1
+from json import dumps as json_dumps, loads as json_loads
+from socket import socket, create_connection, IPPROTO_TCP, SOL_SOCKET, SO_REUSEADDR, TCP_NODELAY
+from sys import exit
+from threading import Event, Lock, Thread
+from time import perf_counter, sleep
+from uuid import uuid4
+
+PORT = 53535
+LOG_LIMIT = 10000
+STATE_KEYS = ("size", "pokemon", "grid", "list", "current_pokemon", "pokemon_status", "weights", "categories", "balance",
+              "templates", "sources", "expanded")
+
+def state_of(bingo) -> dict:
+    """
+    The replicated part of a bingo, as plain data.
+    """
+    state = {key: value for key, value in bingo.toDict().items() if key in STATE_KEYS}
+    state["grid"] = [row.copy() for row in state["grid"]]
+    state["list"] = state["list"].copy()
+    state["expanded"] = state["expanded"].copy()
+    return state
+
+def state_hash(state: dict) -> str:
+    return sha1(json_dumps({key: state[key] for key in ("grid", "list", "current_pokemon", "pokemon_status")},
+                           sort_keys=True).encode()).hexdigest()[:10]
+
+def diff(state: dict, bingo, objectives=None) -> list:
+    """
+    Deltas that turn the state into the bingo. If objectives is given, only those objectives of the list are compared.
+    Objectives made from templates carry their template along, and flagged ones are on their way out so they don't get added.
+    """
+    deltas = []
+    old = state["list"]
+    new = bingo.list
+    for key in (old if objectives is None else objectives):
+        if key in old and key not in new:
+            deltas.append(["remove", key])
+    for key in (new if objectives is None else objectives):
+        if key in new:
+            if key not in old and key not in bingo.flagged:
+                deltas.append(["add", key, bingo.expanded[key]] if key in bingo.expanded else ["add", key])
+            if new[key] != old.get(key, 0):
+                deltas.append(["status", key, new[key]])
+    for i, row in enumerate(bingo.grid):
+        for j, obj in enumerate(row):
+            if obj != state["grid"][i][j]:
+                deltas.append(["cell", i, j, obj, bingo.expanded[obj]] if obj in bingo.expanded else ["cell", i, j, obj])
+    if bingo.pokemon_status != state["pokemon_status"]:
+        deltas.append(["pokemon_status", bingo.pokemon_status])
+    return deltas
+
+def apply_to_state(state: dict, deltas: list) -> None:
+    for delta in deltas:
+        if delta[0] == "cell":
+            _, i, j, obj, *template = delta
+            state["grid"][i][j] = obj
+            if state["pokemon"] and i == j and i == int(state["size"]/2):
+                state["current_pokemon"] = obj
+            elif obj not in state["list"]:
+                state["list"][obj] = 0
+                if template:
+                    state["expanded"][obj] = template[0]
+        elif delta[0] == "status":
+            state["list"][delta[1]] = delta[2]
+        elif delta[0] == "pokemon_status":
+            state["pokemon_status"] = delta[1]
+        elif delta[0] == "add":
+            if delta[1] not in state["list"]:
+                state["list"][delta[1]] = 0
+                if len(delta) > 2:
+                    state["expanded"][delta[1]] = delta[2]
+        elif delta[0] == "remove":
+            state["list"].pop(delta[1], None)
+            state["expanded"].pop(delta[1], None)
+
+def apply_to_bingo(bingo, deltas: list) -> list:
+    """
+    Applies deltas through the bingo's own methods, so they end up in its history and event log.
+    Returns the cells that changed.
+    """
+    cells = set()
+    for delta in deltas:
+        if delta[0] == "cell":
+            _, i, j, obj, *template = delta
+            if bingo.grid[i][j] != obj:
+                bingo.replace(i, j, False, obj, *template)
+                cells.add((i, j))
+        elif delta[0] == "status":
+            bingo.add_objective(delta[1])
+            if bingo.list[delta[1]] != delta[2]:
+                bingo.set_status(delta[1], delta[2])
+                cells.update(bingo.cells_of({delta[1]}))
+        elif delta[0] == "pokemon_status":
+            if bingo.pokemon_status != delta[1]:
+                bingo.set_pokemon_status(delta[1])
+                cells.add((int(bingo.size/2), int(bingo.size/2)))
+        elif delta[0] == "add":
+            bingo.add_objective(*delta[1:])
+        elif delta[0] == "remove":
+            if delta[1] in bingo.list:
+                on_board = bingo.cells_of({delta[1]})
+                if not on_board:
+                    bingo.remove_objective(delta[1])
+                elif delta[1] not in bingo.flagged:
+                    # the board here still shows it (e.g. after an undo), so it goes once it leaves
+                    bingo.flag_objective(delta[1])
+                    cells.update(on_board)
+    return sorted(cells)
+
+def delta_key(delta: list) -> tuple:
+    """
+    What a delta sets: a cell, an objective or the pokemon status. Later deltas with the same key replace it.
+    """
+    if delta[0] == "cell":
+        return ("cell", delta[1], delta[2])
+    if delta[0] == "pokemon_status":
+        return ("pokemon_status",)
+    return ("objective", delta[1])
+
+class Replica:
+    """
+    What this peer last sent or received. Local changes are found by diffing the bingo against it.
+    The bingo's history tells which objectives can have changed, so the full list only gets compared after an undo or reset.
+    """
+    def __init__(self, bingo):
+        self.state = state_of(bingo)
+        self.outstanding = deque()  # keys of each batch we sent that the host hasn't sent back yet
+        self.mark(bingo)
+
+    def mark(self, bingo) -> None:
+        self.history = len(bingo.history)
+        self.last_op = bingo.history[-1] if bingo.history else None
+
+    def touched(self, bingo) -> set | None:
+        history = bingo.history
+        if self.history > len(history) or (self.history and history[self.history-1] is not self.last_op):
+            return None     # history got rewound (undo), so anything could have changed
+        objectives = set()
+        for op in history[self.history:]:
+            if op[0] == "x":
+                return None
+            if op[0] in ("t", "a", "d"):
+                objectives.add(op[1])
+            elif op[0] == "r" and len(op) > 3:
+                objectives.add(op[3])
+            elif op[0] == "n":
+                objectives.update(op[1:])
+            elif op[0] == "f":
+                objectives.add(op[1])
+            if op[0] in ("p", "r", "u"):
+                # objectives made from templates or flagged as removed come and go with the board
+                objectives.update(obj for row in self.state["grid"] for obj in row)
+                objectives.update(obj for row in bingo.grid for obj in row)
+        return objectives
+
+    def local_changes(self, bingo) -> list:
+        deltas = diff(self.state, bingo, self.touched(bingo))
+        apply_to_state(self.state, deltas)
+        self.mark(bingo)
+        if deltas:
+            self.outstanding.append({delta_key(delta) for delta in deltas})
+        return deltas
+
+    def apply(self, bingo, deltas: list, own: bool=False) -> list:
+        """
+        Applies a batch in the host's order. Our own batches come back in the order we sent them and only set
+        what no newer batch of ours has changed since.
+        """
+        if own and self.outstanding:
+            self.outstanding.popleft()
+            newer = set().union(*self.outstanding)
+            deltas = [delta for delta in deltas if delta_key(delta) not in newer]
+        cells = apply_to_bingo(bingo, deltas)
+        apply_to_state(self.state, deltas)
+        self.mark(bingo)
+        return cells
+
+class Connection:
+    """
+    Newline separated JSON messages over a socket.
+    """
+    def __init__(self, sock: socket):
+        sock.setsockopt(IPPROTO_TCP, TCP_NODELAY, 1)   # deltas are tiny, don't let them wait for more data
+        self.sock = sock
+        self.file = sock.makefile("r", encoding="utf-8")
+        self.lock = Lock()
+
+    def send(self, message: dict) -> None:
+        with self.lock:
+            self.sock.sendall((json_dumps(message, separators=(",", ":")) + "\n").encode())
+
+    def messages(self):
+        for line in self.file:
+            yield json_loads(line)
+
+    def close(self) -> None:
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+class SyncHost:
+    """
+    Hosts a session. on_deltas(seq, deltas, origin) gets called for every numbered batch, in order, from network threads.
+    """
+    def __init__(self, state: dict, on_deltas, port: int=PORT, address: str=""):
+        self.session = uuid4().hex
+        self.peer = "host"
+        self.state = deepcopy(state)
+        self.on_deltas = on_deltas
+        self.seq = 0
+        self.log = deque(maxlen=LOG_LIMIT)
+        self.clients = {}
+        self.lock = Lock()
+        self.closed = False
+        self.server = socket()
+        self.server.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
+        self.server.bind((address, port))
+        self.server.listen()
+        self.port = self.server.getsockname()[1]
+        Thread(target=self.accept, daemon=True).start()
+
+    def send(self, deltas: list) -> None:
+        self.publish(deltas, self.peer, "")
+
+    def publish(self, deltas: list, origin: str, op: str) -> None:
+        with self.lock:
+            self.seq += 1
+            message = {"type": "delta", "seq": self.seq, "origin": origin, "op": op, "deltas": deltas}
+            self.log.append(message)
+            apply_to_state(self.state, deltas)
+            for peer, conn in list(self.clients.items()):
+                try:
+                    conn.send(message)
+                except OSError:
+                    self.clients.pop(peer, None)
+                    conn.close()
+            self.on_deltas(self.seq, deltas, origin)
+
+    def accept(self) -> None:
+        while not self.closed:
+            try:
+                sock, _ = self.server.accept()
+            except OSError:
+                return
+            sock.settimeout(5)      # a stuck peer shouldn't hold up everyone else
+            Thread(target=self.serve, args=(Connection(sock),), daemon=True).start()
+
+    def serve(self, conn: Connection) -> None:
+        peer = None
+        try:
+            messages = conn.messages()
+            hello = next(messages)
+            peer = hello["peer"]
+            with self.lock:
+                # catch up: missed deltas if we still have them all, a snapshot otherwise
+                last_seq = hello.get("last_seq", 0)
+                if hello.get("session") == self.session and (self.seq == last_seq or (self.log and self.log[0]["seq"] <= last_seq + 1)):
+                    for message in self.log:
+                        if message["seq"] > last_seq:
+                            conn.send(message)
+                else:
+                    conn.send({"type": "snapshot", "seq": self.seq, "state": self.state})
+                conn.send({"type": "ready", "session": self.session, "seq": self.seq})
+                self.clients[peer] = conn
+            conn.sock.settimeout(None)
+            for message in messages:
+                if message["type"] == "ops":
+                    self.publish(message["deltas"], peer, message["op"])
+        except (OSError, ValueError, StopIteration):
+            pass
+        finally:
+            with self.lock:
+                if peer and self.clients.get(peer) is conn:
+                    self.clients.pop(peer)
+            conn.close()
+
+    def peers(self) -> int:
+        return len(self.clients)
+
+    def close(self) -> None:
+        self.closed = True
+        self.server.close()
+        with self.lock:
+            for conn in self.clients.values():
+                conn.close()
+            self.clients = {}
+
+class SyncClient:
+    """
+    Joins a session and keeps rejoining if the connection drops.
+    on_deltas(seq, deltas, origin) and on_snapshot(seq, state) get called in order from the network thread.
+    """
+    def __init__(self, address: str, on_deltas, on_snapshot, port: int=PORT):
+        self.address = address
+        self.port = port
+        self.on_deltas = on_deltas
+        self.on_snapshot = on_snapshot
+        self.peer = uuid4().hex[:8]
+        self.session = ""
+        self.last_seq = 0
+        self.counter = 0
+        self.pending = {}       # op id -> (deltas, time sent), until the host sends them back
+        self.round_trips = deque(maxlen=1000)
+        self.error = ""         # why the last connection attempt failed
+        self.conn = None
+        self.ready = Event()
+        self.lock = Lock()
+        self.closed = False
+        Thread(target=self.run, daemon=True).start()
+
+    def send(self, deltas: list) -> None:
+        with self.lock:
+            self.counter += 1
+            op = self.peer + ":" + str(self.counter)
+            self.pending[op] = (deltas, perf_counter())
+            conn = self.conn if self.ready.is_set() else None
+        if conn:
+            try:
+                conn.send({"type": "ops", "op": op, "deltas": deltas})
+            except OSError:
+                pass    # gets sent again after rejoining
+
+    def run(self) -> None:
+        backoff = 0.1
+        while not self.closed:
+            try:
+                conn = Connection(create_connection((self.address, self.port), timeout=5))
+                conn.sock.settimeout(None)
+                self.conn = conn
+                conn.send({"type": "hello", "peer": self.peer, "session": self.session, "last_seq": self.last_seq})
+                for message in conn.messages():
+                    backoff = 0.1
+                    self.receive(message)
+            except (OSError, ValueError) as e:
+                self.error = str(e) or type(e).__name__
+            self.ready.clear()
+            self.conn = None
+            if not self.closed:
+                sleep(backoff)
+                backoff = min(backoff * 2, 5)
+
+    def receive(self, message: dict) -> None:
+        if message["type"] == "delta":
+            if message["seq"] <= self.last_seq:
+                return
+            self.last_seq = message["seq"]
+            with self.lock:
+                sent = self.pending.pop(message["op"], None)
+            if sent:
+                self.round_trips.append(perf_counter() - sent[1])
+            self.on_deltas(message["seq"], message["deltas"], message["origin"])
+        elif message["type"] == "snapshot":
+            self.last_seq = message["seq"]
+            self.on_snapshot(message["seq"], message["state"])
+        elif message["type"] == "ready":
+            self.session = message["session"]
+            with self.lock:
+                pending = list(self.pending.items())
+                self.ready.set()
+            for op, (deltas, _) in pending:
+                self.conn.send({"type": "ops", "op": op, "deltas": deltas})
+
+    def close(self) -> None:
+        self.closed = True
+        if self.conn:
+            self.conn.close()
+
+###################
+# Latency benchmark
+###################
+
+def bench_state(objectives: int=200) -> dict:
+    return {"size": 5, "pokemon": False,
+            "grid": [["obj " + str(i*5 + j) for j in range(5)] for i in range(5)],
+            "list": {"obj " + str(n): 0 for n in range(objectives)},
+            "current_pokemon": "", "pokemon_status": 0, "weights": {}, "categories": {}, "balance": {}}
+
+def bench_peer(port: int, ops: int, total: int, interval: float, results) -> None:
+    """
+    A joined peer that ticks random objectives and reports how long each took to come back from the host.
+    Waits until all total ops of all peers came in, then reports its board.
+    """
+    from random import Random
+    rng = Random()
+    state = {}
+    done = Event()
+
+    def on_snapshot(seq, snapshot):
+        state.clear()
+        state.update(deepcopy(snapshot))
+
+    def on_deltas(seq, deltas, origin):
+        apply_to_state(state, deltas)
+        if seq >= total:
+            done.set()
+
+    client = SyncClient("127.0.0.1", on_deltas, on_snapshot, port)
+    client.ready.wait(10)
+    for _ in range(ops):
+        client.send([["status", "obj " + str(rng.randrange(25)), rng.randint(0, 1)]])
+        sleep(interval)
+    done.wait(60)
+    results.put((list(client.round_trips), state_hash(state)))
+    client.close()
+
+def bench(peers: int, ops: int, interval: float) -> int:
+    from multiprocessing import get_context
+    ctx = get_context("spawn")
+    results = ctx.Queue()
+    host = SyncHost(bench_state(), lambda seq, deltas, origin: None, port=0, address="127.0.0.1")
+    processes = [ctx.Process(target=bench_peer, args=(host.port, ops, peers*ops, interval, results)) for _ in range(peers)]
+    for process in processes:
+        process.start()
+    round_trips = []
+    hashes = []
+    for _ in range(peers):
+        peer_round_trips, peer_hash = results.get(timeout=120)
+        round_trips += peer_round_trips
+        hashes.append(peer_hash)
+    for process in processes:
+        process.join()
+    host.close()
+
+    round_trips.sort()
+    print("{} peers, {} ops, host seq {}".format(peers, len(round_trips), host.seq))
+    for p in (50, 95, 99):
+        print("p{}: {:.2f} ms".format(p, round_trips[min(len(round_trips)-1, int(p / 100 * len(round_trips)))] * 1000))
+    print("max: {:.2f} ms".format(round_trips[-1] * 1000))
+    converged = all(h == state_hash(host.state) for h in hashes)
+    print("converged" if converged else "DIVERGED: " + " ".join(hashes) + " host " + state_hash(host.state))
+    return 0 if converged else 1
+
+def main() -> int:
+    parser = ArgumentParser(description="Co-op sync tools.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    bench_parser = sub.add_parser("bench", help="measure sync latency with local peer processes")
+    bench_parser.add_argument("--peers", type=int, default=3)
+    bench_parser.add_argument("--ops", type=int, default=200, help="ops per peer")
+    bench_parser.add_argument("--interval", type=float, default=0.01, help="seconds between ops")
+    args = parser.parse_args()
+    return bench(args.peers, args.ops, args.interval)
+
+if __name__ == "__main__":
+    exit(main())
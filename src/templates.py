@@ -0,0 +1,38 @@
+from re import compile as re_compile
+
+PLACEHOLDER = re_compile(r"\{(\w+)\}")
+
+def placeholders(text: str) -> list:
+    """
+    Distinct placeholder names in the order they first show up.
+    """
+    names = []
+    for name in PLACEHOLDER.findall(text):
+        if name not in names:
+            names.append(name)
+    return names
+
+class Template:
+    """
+    An objective like "Beat {boss} with {restriction}" that stands for every combination of its placeholder values.
+    The combinations are never listed; an index into the product is turned into an objective on demand.
+    A placeholder used twice gets the same value both times.
+    """
+    def __init__(self, pattern: str, sources: dict):
+        self.pattern = pattern
+        self.fields = placeholders(pattern)
+        self.values = [sources[name] for name in self.fields]
+        self.count = 1
+        for values in self.values:
+            self.count *= len(values)
+
+    def expand(self, index: int) -> str:
+        chosen = {}
+        for name, values in zip(reversed(self.fields), reversed(self.values)):
+            index, k = divmod(index, len(values))
+            chosen[name] = values[k]
+        return PLACEHOLDER.sub(lambda match: chosen[match.group(1)], self.pattern)
+
+    def __iter__(self):
+        for index in range(self.count):
+            yield self.expand(index)
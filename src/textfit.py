@@ -0,0 +1,94 @@
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QFont, QFontMetrics
+from PySide6.QtWidgets import QLabel, QSizePolicy
+
+MIN_SIZE = 6
+MAX_SIZE = 72
+BUCKET = 8      # cell sizes are rounded down to this many pixels, so a resize mostly hits the cache
+PADDING = 6
+CACHE_LIMIT = 20000
+
+_fits = {}
+
+def wrap(text: str, metrics: QFontMetrics, width: int) -> list | None:
+    """
+    Greedy word wrap. Returns None if a single word is already too wide.
+    """
+    lines = []
+    for paragraph in text.split("\n"):
+        line = ""
+        for word in paragraph.split():
+            if metrics.horizontalAdvance(word) > width:
+                return None
+            candidate = line + " " + word if line else word
+            if line and metrics.horizontalAdvance(candidate) > width:
+                lines.append(line)
+                line = word
+            else:
+                line = candidate
+        lines.append(line)
+    return lines
+
+def fit_text(text: str, family: str, bold: bool, width: int, height: int) -> tuple[int, str]:
+    """
+    Biggest point size the text fits in a cell at, found by binary search, and the text wrapped for that size.
+    Memoized by (text, family, bold, cell size bucket).
+    """
+    width = width // BUCKET * BUCKET
+    height = height // BUCKET * BUCKET
+    key = (text, family, bold, width, height)
+    if key in _fits:
+        return _fits[key]
+
+    font = QFont(family)
+    font.setBold(bold)
+    def attempt(size: int) -> list | None:
+        font.setPointSize(size)
+        metrics = QFontMetrics(font)
+        lines = wrap(text, metrics, width - PADDING)
+        if lines is None or len(lines) * metrics.lineSpacing() > height - PADDING:
+            return None
+        return lines
+
+    lo, hi = MIN_SIZE, MAX_SIZE
+    best = None
+    while lo <= hi:
+        size = (lo + hi) // 2
+        lines = attempt(size)
+        if lines is None:
+            hi = size - 1
+        else:
+            best = (size, "\n".join(lines))
+            lo = size + 1
+    if best is None:
+        best = (MIN_SIZE, text)     # doesn't fit at all; let Qt wrap it as well as it can
+
+    if len(_fits) >= CACHE_LIMIT:
+        _fits.clear()
+    _fits[key] = best
+    return best
+
+class fitLabel(QLabel):
+    """
+    Label that shows its text at the biggest font size that fits, refitted on resize.
+    It ignores its own size hint, so the text never pushes the board layout around.
+    """
+    def __init__(self, text: str, family: str, bold: bool, parent=None):
+        super().__init__(parent)
+        self.full_text = text
+        self.family = family
+        self.bold = bold
+        self.fitted = None
+        self.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.setSizePolicy(QSizePolicy.Policy.Ignored, QSizePolicy.Policy.Ignored)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        fitted = fit_text(self.full_text, self.family, self.bold, self.width(), self.height())
+        if fitted != self.fitted:
+            self.fitted = fitted
+            font = QFont(self.family, fitted[0])
+            font.setBold(self.bold)
+            self.setFont(font)
+            self.setWordWrap(fitted[0] == MIN_SIZE)
+            self.setText(fitted[1])
@@ -1,21 +1,35 @@
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
 from io import BytesIO
 from json import dump as json_dump, load as json_load
 from PIL import Image
-from PySide6.QtCore import Qt, QSize
-from PySide6.QtGui import QAction, QIcon, QFontDatabase, QFont
+from PySide6.QtCore import Qt, QSize, QObject, Signal, QFileSystemWatcher, QTimer
+from PySide6.QtGui import QAction, QIcon, QFontDatabase, QFont, QGuiApplication, QColor, QImage, QPixmap
 from PySide6.QtWidgets import (QMainWindow, QGroupBox, QFileDialog, QMenuBar, QMenu, QFormLayout,
                                 QPushButton, QSizePolicy, QGridLayout, QDialog, QDialogButtonBox,
                                 QSpinBox, QCheckBox, QLabel, QMessageBox, QToolBar, QLineEdit,
                                 QHBoxLayout, QWidget, QScrollArea, QVBoxLayout, QTabWidget, QComboBox,
-                                QRadioButton)
+                                QRadioButton, QDoubleSpinBox, QPlainTextEdit, QInputDialog, QTableWidget,
+                                QTableWidgetItem, QHeaderView, QAbstractItemView)
 from os import path as os_path
+from time import localtime, strftime
 from re import compile as re_compile, match as re_match
 from urllib import request
 
+from analytics import line_name, report as analytics_report
 from bingo import Bingo
+from library import Library, header_of, read_save, write_save
+from listwatch import ListLink
+from sync import PORT as SYNC_PORT, Replica, SyncClient, SyncHost, state_of
+from textfit import fitLabel
+
+PREROLL = 3
+SPRITE_CACHE = 32
+JOIN_TIMEOUT = 10
 
 class App(QMainWindow):
+    sprite_url = "https://img.pokemondb.net/sprites/home/normal/"
+
     def __init__(self):
         super().__init__()
 
@@ -23,7 +37,22 @@ class App(QMainWindow):
         self.bingo = Bingo(0, False, False)
         self.prev_bingo = deepcopy(self.bingo)
         self.save_file = ""
+        self.library = Library()
+        self.list_link = None
+        self.list_watcher = QFileSystemWatcher(self)
+        self.list_watcher.fileChanged.connect(self.listFileChanged)
+        self.sprites = {}   # pokemon -> future of its cropped sprite, fetched in the background
+        self.sprite_pool = ThreadPoolExecutor(max_workers=2)
+        self.pokemon_queue = []
+        self.preroll_key = None
         self.replaceMode = False
+        self.selected = set()
+        self.sync = None
+        self.replica = None
+        self.join_save_file = ""
+        self.sync_bridge = syncBridge()
+        self.sync_bridge.deltas.connect(self.syncDeltas, Qt.ConnectionType.QueuedConnection)
+        self.sync_bridge.snapshot.connect(self.syncSnapshot, Qt.ConnectionType.QueuedConnection)
 
         self.initUI()
 
@@ -56,11 +85,13 @@ class App(QMainWindow):
         # Create menus
         fileMenu = QMenu("&File", self)
         editMenu = QMenu("&Edit", self)
+        coopMenu = QMenu("&Co-op", self)
         settingsMenu = QMenu("&Settings", self)
         
         # Add menus to menubar
         menuBar.addMenu(fileMenu)
         menuBar.addMenu(editMenu)
+        menuBar.addMenu(coopMenu)
         menuBar.addMenu(settingsMenu)
 
         # Create actions
@@ -68,21 +99,74 @@ class App(QMainWindow):
         fileNew.triggered.connect(self.fileNew)
         fileOpen = QAction("&Open", self)
         fileOpen.triggered.connect(self.fileOpen)
+        fileLibrary = QAction("Session &Library", self)
+        fileLibrary.triggered.connect(self.fileLibrary)
         fileExport = QAction("&Export Objectives List", self)
         fileExport.triggered.connect(self.fileExportList)
+        fileOpenCode = QAction("Open &Board Code", self)
+        fileOpenCode.triggered.connect(self.fileOpenCode)
+        fileCopyCode = QAction("&Copy Board Code", self)
+        fileCopyCode.triggered.connect(self.fileCopyCode)
+        fileAnalytics = QAction("Session &Analytics", self)
+        fileAnalytics.triggered.connect(self.fileAnalytics)
+        fileDifficulty = QAction("Board &Difficulty", self)
+        fileDifficulty.triggered.connect(self.fileDifficulty)
         editUndo = QAction("&Undo", self)
         editUndo.triggered.connect(self.editUndo)
         editManageList = QAction("&Manage Objectives List", self)
         editManageList.triggered.connect(self.editManageList)
+        editSelectLine = QAction("&Select Line", self)
+        editSelectLine.triggered.connect(self.editSelectLine)
+        editSelectAll = QAction("Select &All", self)
+        editSelectAll.triggered.connect(self.editSelectAll)
+        editClearSelection = QAction("&Deselect", self)
+        editClearSelection.triggered.connect(self.editClearSelection)
+        editMarkSelected = QAction("&Mark Selected Complete", self)
+        editMarkSelected.triggered.connect(self.editMarkSelected)
+        editUnmarkSelected = QAction("Mark Selected &Incomplete", self)
+        editUnmarkSelected.triggered.connect(self.editUnmarkSelected)
+        editReroll = QAction("&Reroll Uncompleted", self)
+        editReroll.triggered.connect(self.editReroll)
+        editImportStatus = QAction("Import &Completion States", self)
+        editImportStatus.triggered.connect(self.editImportStatus)
+        editLinkList = QAction("&Link List File", self)
+        editLinkList.triggered.connect(self.editLinkList)
+        editUnlinkList = QAction("Unlink List &File", self)
+        editUnlinkList.triggered.connect(self.editUnlinkList)
+        coopHost = QAction("&Host Session", self)
+        coopHost.triggered.connect(self.coopHost)
+        coopJoin = QAction("&Join Session", self)
+        coopJoin.triggered.connect(self.coopJoin)
+        coopLeave = QAction("&Leave Session", self)
+        coopLeave.triggered.connect(self.coopLeave)
         settingsAppearance = QAction("&Appearance", self)
         settingsAppearance.triggered.connect(self.settingsAppearance)
 
         # Add actions to menus
         fileMenu.addActions([fileNew,
                              fileOpen,
-                             fileExport])
+                             fileLibrary,
+                             fileExport,
+                             fileOpenCode,
+                             fileCopyCode,
+                             fileAnalytics,
+                             fileDifficulty])
         editMenu.addActions([editUndo,
                              editManageList])
+        editMenu.addSeparator()
+        editMenu.addActions([editSelectLine,
+                             editSelectAll,
+                             editClearSelection,
+                             editMarkSelected,
+                             editUnmarkSelected,
+                             editReroll,
+                             editImportStatus])
+        editMenu.addSeparator()
+        editMenu.addActions([editLinkList,
+                             editUnlinkList])
+        coopMenu.addActions([coopHost,
+                             coopJoin,
+                             coopLeave])
         settingsMenu.addActions([settingsAppearance])
 
         self.setMenuBar(menuBar)
@@ -107,12 +191,18 @@ class App(QMainWindow):
             elif output["pokemon"] and output["size"] % 2 == 0:
                 msg.setText("Pokemon in middle square cannot be checked while size is even!")
                 msg.exec()
+            elif output["seed"] and not output["seed"].isdigit():
+                msg.setText("Seed has to be a whole number!")
+                msg.exec()
             else:
-                self.save_file = output["save_file"]
-                self.bingo = Bingo(output["size"], output["pokemon"], active=True, new=True, list_file=output["list_file"])
-                self.prev_bingo = deepcopy(self.bingo)
-                self.save()
-                self.updateBingoUI()
+                seed = int(output["seed"]) if output["seed"] else None
+                try:
+                    bingo = Bingo(output["size"], output["pokemon"], active=True, new=True, list_file=output["list_file"], balance=output["balance"], seed=seed)
+                except ValueError as e:
+                    msg.setText(str(e))
+                    msg.exec()
+                    return
+                self.startBingo(bingo, output["save_file"])
 
     def fileOpen(self):
         """
@@ -120,27 +210,64 @@ class App(QMainWindow):
         """
         fileName, _ = QFileDialog.getOpenFileName(self, "Open File", "","JSON File (*.json);;All Files (*)")
         if fileName:
-            with open(fileName, 'r') as f:
-                data = json_load(f)
-            try:
-                size = int(data["size"])
-                pokemon = data["pokemon"]
-                grid = data["grid"]
-                obj_list = data["list"]
-                current_pokemon = data["current_pokemon"]
-                pokemon_status = data["pokemon_status"]
-                self.bingo = Bingo.fromSave(size, pokemon, grid, obj_list, current_pokemon, pokemon_status)
-                self.save_file = fileName
-                self.prev_bingo = deepcopy(self.bingo)
-                self.updateBingoUI()
-            except Exception as e:
-                msg = QMessageBox()
-                msg.setIcon(QMessageBox.Icon.Warning)
-                msg.setWindowTitle("Couldn't read file.")
-                msg.setWindowIcon(QIcon("resources/icon.ico"))
-                msg.setText(str(e))
-                msg.exec()
+            self.openSave(fileName, read_save(fileName))
+
+    def fileLibrary(self):
+        """
+        Opens a bingo from the library of past sessions.
+        """
+        dlg = libraryDialog(self.library, self.settings["appearance"]["complete_color"])
+        if dlg.exec():
+            fileName, header = dlg.output()
+            if fileName:
+                self.openSave(fileName, read_save(fileName, header))
+        self.library.store()
+
+    def openSave(self, fileName: str, data: dict):
+        """
+        Starts the bingo from a save file's contents.
+        """
+        try:
+            size = int(data["size"])
+            pokemon = data["pokemon"]
+            grid = data["grid"]
+            obj_list = data["list"]
+            current_pokemon = data["current_pokemon"]
+            pokemon_status = data["pokemon_status"]
+            bingo = Bingo.fromSave(size, pokemon, grid, obj_list, current_pokemon, pokemon_status,
+                                   weights=data.get("weights"), categories=data.get("categories"), balance=data.get("balance"),
+                                   seed=data.get("seed"), rng_state=data.get("rng_state"), history=data.get("history"),
+                                   list_hash=data.get("list_hash", ""), events=data.get("events"),
+                                   templates=data.get("templates"), sources=data.get("sources"), expanded=data.get("expanded"),
+                                   list_file=data.get("list_file", ""), link=data.get("link"), flagged=data.get("flagged"))
+            self.startBingo(bingo, fileName, save=False)
+            self.library.put(fileName, data.get("header") or header_of(data))
+        except Exception as e:
+            msg = QMessageBox()
+            msg.setIcon(QMessageBox.Icon.Warning)
+            msg.setWindowTitle("Couldn't read file.")
+            msg.setWindowIcon(QIcon("resources/icon.ico"))
+            msg.setText(str(e))
+            msg.exec()
     
+    def startBingo(self, bingo: Bingo, save_file: str, save: bool=True, keep_sync: bool=False):
+        """
+        Makes the given bingo the current one. Leaves a co-op session unless keep_sync is set.
+        """
+        if not keep_sync:
+            self.coopLeave()
+        if self.save_file and save_file != self.save_file:
+            self.library.store()
+        self.bingo = bingo
+        self.save_file = save_file
+        self.prev_bingo = deepcopy(self.bingo)
+        if save:
+            self.save()
+        self.prerollPokemon()
+        self.updateBingoUI()
+        self.watchList()
+        self.balanceNotice()
+
     def fileExportList(self):
         """
         Opens a file dialog to save the objectives list file.
@@ -149,12 +276,83 @@ class App(QMainWindow):
         if fileName:
             self.bingo.export_list(fileName)
 
+    def fileOpenCode(self):
+        """
+        Rebuilds a bingo from a board code and the objectives list it was made from.
+        """
+        dlg = boardCodeDialog()
+        if dlg.exec():
+            output = dlg.output()
+            msg = QMessageBox()
+            msg.setIcon(QMessageBox.Icon.Warning)
+            msg.setWindowTitle("Warning")
+            msg.setWindowIcon(QIcon("resources/icon.ico"))
+            if not output["code"]:
+                msg.setText("Board Code missing!")
+                msg.exec()
+            elif not output["list_file"]:
+                msg.setText("Objectives List File missing!")
+                msg.exec()
+            elif not output["save_file"]:
+                msg.setText("Save File missing!")
+                msg.exec()
+            else:
+                try:
+                    bingo = Bingo.fromCode(output["code"], output["list_file"])
+                except ValueError as e:
+                    msg.setText(str(e))
+                    msg.exec()
+                    return
+                self.startBingo(bingo, output["save_file"])
+
+    def fileCopyCode(self):
+        """
+        Copies the board code of the current bingo to the clipboard.
+        Boards that weren't made from a list file here (older saves, joined co-op sessions) have no list to rebuild from.
+        """
+        if self.bingo.active:
+            if not self.bingo.list_hash:
+                msg = QMessageBox()
+                msg.setIcon(QMessageBox.Icon.Warning)
+                msg.setWindowTitle("Warning")
+                msg.setWindowIcon(QIcon("resources/icon.ico"))
+                msg.setText("This board has no board code.\nOnly boards made from a list file with this version can be rebuilt from one.")
+                msg.exec()
+                return
+            QGuiApplication.clipboard().setText(self.bingo.board_code())
+
+    def fileAnalytics(self):
+        """
+        Shows completion rate, line timeline and time to complete of the current session.
+        """
+        if self.bingo.active:
+            dlg = analyticsDialog(self.bingo.toDict())
+            dlg.exec()
+
+    def fileDifficulty(self):
+        """
+        Simulates the current board to estimate the time to the first line and to a blackout.
+        """
+        if self.bingo.active:
+            try:
+                import montecarlo
+            except ImportError:
+                msg = QMessageBox()
+                msg.setIcon(QMessageBox.Icon.Warning)
+                msg.setWindowTitle("Board Difficulty")
+                msg.setWindowIcon(QIcon("resources/icon.ico"))
+                msg.setText("The board analysis needs NumPy (pip install numpy).")
+                msg.exec()
+                return
+            dlg = difficultyDialog(self.bingo, montecarlo)
+            dlg.exec()
+
     def editUndo(self):
         """
         Reverts to the previous bingo state. (Only 1 previous state gets saved!)
         """
         if self.prev_bingo.active:
-            self.bingo = deepcopy(self.prev_bingo)
+            self.bingo = self.bingo.undo_to(self.prev_bingo)
             self.save()
             self.updateBingoUI()
     
@@ -165,8 +363,218 @@ class App(QMainWindow):
         if self.bingo.active:
             dlg = manageListDialog(self.bingo.list)
             if dlg.exec():
-                self.bingo.list = dlg.output()
-                self.updateBingoUI()
+                obj_list = dlg.output()
+                self.bulkEdit(lambda: self.objectivesEdited(self.bingo.set_list(obj_list)))
+
+    def editSelectLine(self):
+        """
+        Adds a whole row, column or diagonal to the selection.
+        """
+        if self.bingo.active:
+            dlg = selectLineDialog(self.bingo.size)
+            if dlg.exec():
+                self.select(self.bingo.lines()[dlg.output()])
+
+    def editSelectAll(self):
+        if self.bingo.active:
+            self.select([(i, j) for i in range(self.bingo.size) for j in range(self.bingo.size)])
+
+    def editClearSelection(self):
+        if self.bingo.active:
+            cells = list(self.selected)
+            self.selected = set()
+            self.styleSquares(cells)
+
+    def editMarkSelected(self):
+        self.bulkEdit(lambda: self.cellsEdited(self.bingo.mark_cells(sorted(self.selected), 1)))
+
+    def editUnmarkSelected(self):
+        self.bulkEdit(lambda: self.cellsEdited(self.bingo.mark_cells(sorted(self.selected), 0)))
+
+    def editReroll(self):
+        """
+        Replaces every uncompleted objective on the board at once.
+        """
+        self.bulkEdit(lambda: self.cellsEdited(self.bingo.reroll_uncompleted()))
+
+    def editImportStatus(self):
+        """
+        Takes over completion states from a save file or a list of completed objectives.
+        """
+        if self.bingo.active:
+            fileName, _ = QFileDialog.getOpenFileName(self, "Import Completion States", "","JSON File (*.json);;CSV File (*.csv);;Text File (*.txt);;All Files (*)")
+            if fileName:
+                self.bulkEdit(lambda: self.objectivesEdited(self.bingo.import_statuses(fileName)))
+
+    def editLinkList(self):
+        """
+        Links the session to its objectives list file, so edits to the file get merged in while it's open.
+        """
+        if self.bingo.active:
+            dlg = linkListDialog(self.bingo.link.get("file", self.bingo.list_file), self.bingo.link.get("replace_removed", False))
+            if dlg.exec():
+                output = dlg.output()
+                if not output["file"]:
+                    msg = QMessageBox()
+                    msg.setIcon(QMessageBox.Icon.Warning)
+                    msg.setWindowTitle("Warning")
+                    msg.setWindowIcon(QIcon("resources/icon.ico"))
+                    msg.setText("Objectives List File missing!")
+                    msg.exec()
+                else:
+                    if output["file"] == self.bingo.link.get("file") and "rows" in self.bingo.link:
+                        output["rows"] = self.bingo.link["rows"]    # same file, so its last merged version still counts
+                    self.bingo.link = output
+                    self.save()
+                    self.watchList()
+
+    def editUnlinkList(self):
+        if self.bingo.active and self.bingo.link:
+            self.bingo.link = {}
+            self.save()
+            self.watchList()
+
+    def watchList(self):
+        """
+        Starts watching the current bingo's linked list file, or stops watching if it has none.
+        The file gets merged in first, so edits made while the session wasn't open (or before it was linked) count too.
+        """
+        if self.list_watcher.files():
+            self.list_watcher.removePaths(self.list_watcher.files())
+        self.list_link = None
+        if self.bingo.active and self.bingo.link:
+            try:
+                self.list_link = ListLink(self.bingo.link["file"])
+                self.list_watcher.addPath(self.bingo.link["file"])
+            except OSError as e:
+                msg = QMessageBox()
+                msg.setIcon(QMessageBox.Icon.Warning)
+                msg.setWindowTitle("Couldn't read linked list file.")
+                msg.setWindowIcon(QIcon("resources/icon.ico"))
+                msg.setText(str(e))
+                msg.exec()
+                return
+            try:
+                self.bulkEdit(lambda: self.bingo.merge_list_file(self.list_link.rows()))
+            except ValueError as e:
+                self.listWarning(str(e))
+
+    def listFileChanged(self, path: str):
+        # editors write in several steps, so wait for them to finish
+        QTimer.singleShot(200, self.mergeListFile)
+
+    def mergeListFile(self):
+        """
+        Merges what changed in the linked list file into the bingo and redraws only the affected squares.
+        """
+        if self.list_link:
+            file = self.list_link.file
+            if file not in self.list_watcher.files() and os_path.exists(file):
+                self.list_watcher.addPath(file)     # saving by replacing the file drops it from the watcher
+            changes = self.list_link.poll()
+            if changes:
+                prev_bingo = deepcopy(self.bingo)
+                try:
+                    cells = self.bingo.merge_list(*changes)
+                except ValueError as e:
+                    self.listWarning(str(e))
+                    return
+                self.prev_bingo = prev_bingo
+                self.save()
+                self.updateSquares(cells)
+
+    def listWarning(self, text: str):
+        msg = QMessageBox()
+        msg.setIcon(QMessageBox.Icon.Warning)
+        msg.setWindowTitle("Couldn't merge linked list file.")
+        msg.setWindowIcon(QIcon("resources/icon.ico"))
+        msg.setText(text)
+        msg.exec()
+
+    def coopHost(self):
+        """
+        Shares the current bingo with other instances on the local network.
+        """
+        if self.bingo.active and not self.sync:
+            port, ok = QInputDialog.getInt(self, "Host Session", "Port:", SYNC_PORT, 1024, 65535)
+            if ok:
+                try:
+                    self.sync = SyncHost(state_of(self.bingo), self.sync_bridge.deltas.emit, port)
+                except OSError as e:
+                    self.syncWarning(str(e))
+                    return
+                self.replica = Replica(self.bingo)
+                self.setWindowTitle("Bearathon 5 (hosting on port " + str(port) + ")")
+
+    def coopJoin(self):
+        """
+        Joins a hosted bingo. The board from the host replaces the current one once it arrives.
+        """
+        dlg = joinSessionDialog()
+        if dlg.exec():
+            output = dlg.output()
+            if not output["address"]:
+                self.syncWarning("Host address missing!")
+            elif not output["save_file"]:
+                self.syncWarning("Save File missing!")
+            else:
+                self.coopLeave()
+                self.join_save_file = output["save_file"]
+                self.sync = SyncClient(output["address"], self.sync_bridge.deltas.emit, self.sync_bridge.snapshot.emit, output["port"])
+                self.setWindowTitle("Bearathon 5 (joining " + output["address"] + ")")
+                client = self.sync
+                QTimer.singleShot(JOIN_TIMEOUT * 1000, lambda: self.joinTimeout(client))
+
+    def joinTimeout(self, client):
+        """
+        Gives up on a host that didn't send its board in time.
+        """
+        if self.sync is client and self.join_save_file:
+            target = client.address + ":" + str(client.port)
+            error = client.error or "no answer"
+            self.coopLeave()
+            self.syncWarning("Couldn't join the session at " + target + " (" + error + ").")
+
+    def coopLeave(self):
+        if self.sync:
+            self.sync.close()
+            self.sync = None
+            self.replica = None
+            self.join_save_file = ""
+            self.setWindowTitle("Bearathon 5")
+
+    def syncDeltas(self, seq: int, deltas: list, origin: str):
+        """
+        Applies a numbered batch of deltas from the host. Our own changes come back too and are already applied.
+        """
+        if self.replica:
+            cells = self.replica.apply(self.bingo, deltas, origin == self.sync.peer)
+            if cells:
+                self.save()
+                self.updateSquares(cells)
+
+    def syncSnapshot(self, seq: int, state: dict):
+        """
+        The whole board from the host, on joining or after being away for too long.
+        """
+        if self.sync:
+            bingo = Bingo.fromSave(state["size"], state["pokemon"], state["grid"], state["list"], state["current_pokemon"], state["pokemon_status"],
+                                   weights=state["weights"], categories=state["categories"], balance=state["balance"],
+                                   templates=state.get("templates"), sources=state.get("sources"), expanded=state.get("expanded"))
+            self.replica = Replica(bingo)
+            if self.join_save_file:
+                self.save_file = self.join_save_file
+                self.join_save_file = ""
+                self.setWindowTitle("Bearathon 5 (joined " + self.sync.address + ")")
+            self.startBingo(bingo, self.save_file, keep_sync=True)
+
+    def syncWarning(self, text: str):
+        msg = QMessageBox()
+        msg.setIcon(QMessageBox.Icon.Warning)
+        msg.setWindowTitle("Co-op")
+        msg.setWindowIcon(QIcon("resources/icon.ico"))
+        msg.setText(text)
+        msg.exec()
 
     def settingsAppearance(self):
         """
@@ -234,11 +642,8 @@ class App(QMainWindow):
         if self.bingo.active and self.bingo.pokemon_bool:
             dlg = replacePokeDialog(self.bingo.pokemon_list)
             if dlg.exec():
-                self.prev_bingo = deepcopy(self.bingo)
                 random, new_poke = dlg.output()
-                self.bingo.replace(int(self.bingo.size/2), int(self.bingo.size/2), random, new_poke)
-                self.save()
-                self.updateBingoUI()
+                self.replaceSquare(int(self.bingo.size/2), int(self.bingo.size/2), random, new_poke)
 
     def toolWipe(self):
         if self.bingo.active:
@@ -248,10 +653,7 @@ class App(QMainWindow):
             msg.setText("Are you sure you want to wipe the board?")
             msg.setStandardButtons(QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
             if msg.exec() == QMessageBox.StandardButton.Yes:
-                self.prev_bingo = deepcopy(self.bingo)
-                self.bingo.populate()
-                self.save()
-                self.updateBingoUI()
+                self.wipeBoard()
 
     def toolReset(self):
         if self.bingo.active:
@@ -262,29 +664,129 @@ class App(QMainWindow):
             msg.setText("Are you sure you want to reset?\nYou will lose all objective progress.")
             msg.setStandardButtons(QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
             if msg.exec() == QMessageBox.StandardButton.Yes:
-                self.prev_bingo = deepcopy(self.bingo)
-                self.bingo.reset()
-                self.save()
-                self.updateBingoUI()
+                self.resetBoard()
+
+    def wipeBoard(self):
+        self.prev_bingo = deepcopy(self.bingo)
+        self.bingo.populate()
+        self.save()
+        self.updateBingoUI()
+        self.balanceNotice()
+
+    def resetBoard(self):
+        self.prev_bingo = deepcopy(self.bingo)
+        self.bingo.reset()
+        self.save()
+        self.updateBingoUI()
+        self.balanceNotice()
+
+    def balanceNotice(self):
+        """
+        Tells the user in the status bar when the last populate couldn't balance the board and filled it at random instead.
+        """
+        if self.bingo.balance_fallback:
+            self.statusBar().showMessage("Board not balanced: " + self.bingo.balance_fallback, 15000)
+            self.bingo.balance_fallback = ""
+        else:
+            self.statusBar().clearMessage()
+
+    def replaceSquare(self, i: int, j: int, random: bool, new_goal: str=""):
+        """
+        Replaces a square (or the pokemon) and redraws the board.
+        """
+        self.prev_bingo = deepcopy(self.bingo)
+        self.bingo.replace(i, j, random, new_goal)
+        self.save()
+        self.updateSquares([(i, j)])
 
     ########
     # Misc #
     ########
                 
+    def bulkEdit(self, edit):
+        """
+        Runs an edit on the bingo as one transaction: one undo step, one save and only the affected squares get redrawn.
+        The edit returns whether it changed anything and the cells to redraw, which can be none for changes off the board.
+        """
+        if self.bingo.active:
+            prev_bingo = deepcopy(self.bingo)
+            changed, cells = edit()
+            if changed:
+                self.prev_bingo = prev_bingo
+                self.save()
+                self.updateSquares(cells)
+
+    def cellsEdited(self, cells: list) -> tuple[bool, list]:
+        return bool(cells), cells
+
+    def objectivesEdited(self, objectives: set) -> tuple[bool, list]:
+        """
+        An edit of the list counts even if none of the objectives are on the board; only the ones that are get redrawn.
+        """
+        return bool(objectives), self.bingo.cells_of(objectives)
+
+    def select(self, cells: list):
+        self.selected.update(cells)
+        self.styleSquares(cells)
+
     def save(self):
         """
         Saves the current file.
         """
         if self.bingo.active:
             bingo_dict = self.bingo.toDict()
-            with open(self.save_file, "w") as f:
-                json_dump(bingo_dict, f, indent=1)
+            header = header_of(bingo_dict)
+            write_save(self.save_file, bingo_dict, header)
+            self.library.put(self.save_file, header)
+            if self.replica:
+                deltas = self.replica.local_changes(self.bingo)
+                if deltas:
+                    self.sync.send(deltas)
+            self.prerollPokemon()
+
+    def prerollPokemon(self):
+        """
+        Works out the next few random pokemon (on a copy of the rng) and fetches their sprites in the background,
+        so a reroll only has to swap the icon. Whenever the rng or the current pokemon changed, like after a manual pick
+        or an undo, the old queue is thrown away and its fetches that didn't start yet get cancelled.
+        """
+        if not (self.bingo.active and self.bingo.pokemon_bool and self.settings["appearance"]["pokemon_sprite"]):
+            return
+        key = (self.bingo.current_pokemon, self.bingo.rng.getstate())
+        if key == self.preroll_key:
+            return
+        self.preroll_key = key
+        queue = self.bingo.peek_pokemon(PREROLL)
+        for pokemon in self.pokemon_queue:
+            if pokemon not in queue and pokemon != self.bingo.current_pokemon and pokemon in self.sprites and self.sprites[pokemon].cancel():
+                self.sprites.pop(pokemon)
+        self.pokemon_queue = queue
+        for pokemon in queue:
+            self.fetchSprite(pokemon)
+
+    def fetchSprite(self, pokemon: str):
+        """
+        Returns the future of a pokemon's sprite, starting the download if it isn't cached (or failed last time).
+        """
+        future = self.sprites.get(pokemon)
+        if future is None or future.cancelled() or (future.done() and future.exception()):
+            future = self.sprites[pokemon] = self.sprite_pool.submit(self.downloadSprite, self.spriteUrl(pokemon))
+            for old in list(self.sprites):
+                if len(self.sprites) <= SPRITE_CACHE:
+                    break
+                if old not in self.pokemon_queue and old != self.bingo.current_pokemon and old != pokemon:
+                    self.sprites.pop(old)
+        return future
 
     def updateBingoUI(self):
+        self.selected = set()
         for i in reversed(range(self.bingo_layout.count())):
             item = self.bingo_layout.itemAt(i)
             if item:
-                item.widget().setParent(None)
+                # setParent(None) hands the square to Python, which can free it while Qt still uses it
+                widget = item.widget()
+                self.bingo_layout.removeWidget(widget)
+                widget.deleteLater()
         self.bingo_squares = []
         for i in range(self.bingo.size):
             row = []
@@ -295,24 +797,58 @@ class App(QMainWindow):
             self.bingo_squares.append(row)
         self.bingo_layout.update()
 
+    def updateSquares(self, cells: list):
+        """
+        Rebuilds only the given squares.
+        """
+        for i, j in cells:
+            old = self.bingo_squares[i][j]
+            self.bingo_layout.removeWidget(old)
+            old.deleteLater()
+            square = self.createSquare(i, j)
+            self.bingo_layout.addWidget(square, i, j)
+            self.bingo_squares[i][j] = square
+        self.bingo_layout.update()
+
+    def styleSquares(self, cells: list):
+        for i, j in cells:
+            self.bingo_squares[i][j].setStyleSheet(self.squareStyle(i, j))
+
+    def squareStyle(self, i: int, j: int) -> str:
+        style = ""
+        if self.bingo.is_completed(i, j):
+            style += "background-color: " + self.settings["appearance"]["complete_color"] + ";"
+        if self.bingo.is_flagged(i, j):
+            style += "border: 3px dashed " + self.settings["appearance"]["replace_color"] + ";"
+        if (i, j) in self.selected:
+            style += "border: 3px solid " + self.settings["appearance"]["replace_color"] + ";"
+        return style
+
+    def squareLabel(self, text: str, square: QPushButton) -> QLabel:
+        """
+        Puts the text label in a square. With text fitting on, every label gets the biggest font its text fits in.
+        """
+        appearance = self.settings["appearance"]
+        if appearance["text_fit"]:
+            label = fitLabel(text, appearance["font"], appearance["text_bold"], square)
+        else:
+            font = QFont(appearance["font"], appearance["text_size"])
+            font.setBold(appearance["text_bold"])
+            label = QLabel(text, square)
+            label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+            label.setWordWrap(True)
+            label.setFont(font)
+        label.setStyleSheet("color: " + appearance["text_color"])
+        squareLayout = QHBoxLayout(square)
+        squareLayout.addWidget(label)
+        return label
+
     def createSquare(self, i: int, j: int) -> QPushButton:
-        font = QFont(self.settings["appearance"]["font"], self.settings["appearance"]["text_size"])
-        font.setBold(self.settings["appearance"]["text_bold"])
         square = QPushButton()
         square.setSizePolicy(QSizePolicy.Policy.Minimum, QSizePolicy.Policy.Minimum)
         square.clicked.connect(self.squarePress)
         if not (self.bingo.pokemon_bool and i == j and i == int(self.bingo.size/2)):
-            label = QLabel(self.bingo.grid[i][j], square)
-            label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            label.setWordWrap(True)
-            label.setFont(font)
-            label.setStyleSheet("color: " + self.settings["appearance"]["text_color"])
-            squareLayout = QHBoxLayout(square)
-            squareLayout.addWidget(label)
-            if self.bingo.list[self.bingo.grid[i][j]] == 1:
-                square.setStyleSheet("background-color: " + self.settings["appearance"]["complete_color"])
-            else:
-                square.setStyleSheet("")
+            self.squareLabel(self.bingo.grid[i][j], square)
         else:
             if self.settings["appearance"]["pokemon_sprite"]:
                 try:
@@ -320,25 +856,12 @@ class App(QMainWindow):
                     square.setIconSize(square.size())
                     square.setMaximumSize(QSize(int(self.central_widget.size().width()/self.bingo.size)-10, int(self.central_widget.size().height()/self.bingo.size)-10))
                 except Exception as e:
-                    label = QLabel(self.bingo.grid[i][j]+"\n"+str(e)+"\n"+self.url, square)
-                    label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-                    label.setWordWrap(True)
-                    label.setFont(font)
-                    label.setStyleSheet("color: " + self.settings["appearance"]["text_color"])
-                    squareLayout = QHBoxLayout(square)
-                    squareLayout.addWidget(label)
+                    self.squareLabel(self.bingo.grid[i][j]+"\n"+str(e)+"\n"+self.url, square)
             else:
-                label = QLabel(self.bingo.grid[i][j], square)
-                label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-                label.setWordWrap(True)
-                label.setFont(font)
-                label.setStyleSheet("color: " + self.settings["appearance"]["text_color"])
-                squareLayout = QHBoxLayout(square)
-                squareLayout.addWidget(label)
-            if self.bingo.pokemon_status == 1:
-                square.setStyleSheet("background-color: " + self.settings["appearance"]["complete_color"])
-            else:
-                square.setStyleSheet("")
+                self.squareLabel(self.bingo.grid[i][j], square)
+        if self.bingo.is_flagged(i, j):
+            square.setToolTip("Removed from the objectives list file")
+        square.setStyleSheet(self.squareStyle(i, j))
         return square
 
     def squarePress(self):
@@ -346,50 +869,61 @@ class App(QMainWindow):
         for i, row in enumerate(self.bingo_squares):
             for j, square in enumerate(row):
                 if sender == square:
+                    if not self.replaceMode and QGuiApplication.keyboardModifiers() & Qt.KeyboardModifier.ControlModifier:
+                        # ctrl+click selects for bulk edits
+                        self.selected.symmetric_difference_update({(i, j)})
+                        square.setStyleSheet(self.squareStyle(i, j))
+                        return
                     if self.replaceMode:
                         if not (self.bingo.pokemon_bool and i == j and i == int(self.bingo.size/2)):
                             dlg = replaceSquareDialog(self.bingo.list, self.bingo.grid)
                             if dlg.exec():
-                                self.prev_bingo = deepcopy(self.bingo)
                                 random, newGoal = dlg.output()
-                                self.bingo.replace(i, j, random, newGoal)
+                                self.replaceSquare(i, j, random, newGoal)
                             self.replaceMode = False
+                            # drop the replace mode cue
+                            self.styleSquares([(r, c) for r in range(self.bingo.size) for c in range(self.bingo.size)])
                         else:
                             dlg = replacePokeDialog(self.bingo.pokemon_list)
                             if dlg.exec():
-                                self.prev_bingo = deepcopy(self.bingo)
                                 random, new_poke = dlg.output()
-                                self.bingo.replace(int(self.bingo.size/2), int(self.bingo.size/2), random, new_poke)
-                        self.updateBingoUI()
+                                self.replaceSquare(i, j, random, new_poke)
+                        return
                     else:
                         if not (self.bingo.pokemon_bool and i == j and i == int(self.bingo.size/2)):
                             if self.bingo.list[self.bingo.grid[i][j]] == 0:
-                                self.bingo.list[self.bingo.grid[i][j]] = 1
-                                square.setStyleSheet("background-color: " + self.settings["appearance"]["complete_color"])
+                                self.bingo.set_status(self.bingo.grid[i][j], 1)
                             elif self.bingo.list[self.bingo.grid[i][j]] == 1:
-                                self.bingo.list[self.bingo.grid[i][j]] = 0
-                                square.setStyleSheet("")
+                                self.bingo.set_status(self.bingo.grid[i][j], 0)
                         else:
                             if self.bingo.pokemon_status == 0:
-                                self.bingo.pokemon_status = 1
-                                square.setStyleSheet("background-color: " + self.settings["appearance"]["complete_color"])
+                                self.bingo.set_pokemon_status(1)
                             elif self.bingo.pokemon_status == 1:
-                                self.bingo.pokemon_status = 0
-                                square.setStyleSheet("")
+                                self.bingo.set_pokemon_status(0)
+                        square.setStyleSheet(self.squareStyle(i, j))
         self.save()
         self.bingo_layout.update()
 
     def getPokemonSprite(self, pokemon: str="") -> QIcon:
+        self.url = self.spriteUrl(pokemon)
+        return QIcon(self.fetchSprite(pokemon).result().toqpixmap())
+
+    def spriteUrl(self, pokemon: str) -> str:
         pokemon_str = pokemon.lower()
         pokemon_str = pokemon_str.replace(" ", "-")
         pokemon_str = pokemon_str.replace("'", "")
         pokemon_str = pokemon_str.replace("%", "")
         pokemon_str = pokemon_str.replace(".", "")
-        self.url = "https://img.pokemondb.net/sprites/home/normal/" + pokemon_str + ".png"
-        response = request.urlopen(self.url)
+        return self.sprite_url + pokemon_str + ".png"
+
+    @staticmethod
+    def downloadSprite(url: str) -> Image.Image:
+        """
+        Runs on the sprite threads, so no Qt in here.
+        """
+        response = request.urlopen(url, timeout=10)
         img = Image.open(BytesIO(response.read()))
-        img = img.crop(img.getbbox())   # crop empty borders
-        return QIcon(img.toqpixmap())
+        return img.crop(img.getbbox())   # crop empty borders
     
     def importSettings(self):
         try:
@@ -403,6 +937,7 @@ class App(QMainWindow):
             text_size = appearance["text_size"]
             text_bold = appearance["text_bold"]
             text_color = appearance["text_color"]
+            text_fit = appearance.get("text_fit", True)    # settings from before text fitting don't have it
 
             self.settings = {"appearance": {"pokemon_sprite": pokemon_sprite,
                                             "complete_color": complete_color,
@@ -410,7 +945,8 @@ class App(QMainWindow):
                                             "font": text_font,
                                             "text_size": text_size,
                                             "text_bold": text_bold,
-                                            "text_color": text_color}}
+                                            "text_color": text_color,
+                                            "text_fit": text_fit}}
         except:
             self.settings = {"appearance": {"pokemon_sprite": True,
                                             "complete_color": "#008000",
@@ -418,7 +954,8 @@ class App(QMainWindow):
                                             "font": QFontDatabase.SystemFont.GeneralFont.name,
                                             "text_size": 10,
                                             "text_bold": False,
-                                            "text_color": "#ffffff"}}
+                                            "text_color": "#ffffff",
+                                            "text_fit": True}}
             self.saveSettings()
             msg = QMessageBox()
             msg.setIcon(QMessageBox.Icon.Warning)
@@ -467,6 +1004,18 @@ class newBingoSetupDialog(QDialog):
         self.pokemon = QCheckBox(self)
         self.pokemon.setChecked(True)
         layout.addRow("Pokemon in Middle Square:", self.pokemon)
+        self.tolerance = QDoubleSpinBox(self, minimum=0, maximum=100, singleStep=5, value=15, suffix=" %")
+        layout.addRow("Line Difficulty Tolerance:", self.tolerance)
+        self.category_cap_auto = QCheckBox(self)
+        self.category_cap_auto.setChecked(True)
+        layout.addRow("Scale Category Limit with Bingo Size:", self.category_cap_auto)
+        self.category_cap = QSpinBox(self, minimum=0, value=2, enabled=False)
+        self.category_cap.setSpecialValueText("No limit")
+        self.category_cap_auto.toggled.connect(lambda checked: self.category_cap.setEnabled(not checked))
+        layout.addRow("Max Objectives per Category on a Line:", self.category_cap)
+        self.seed = QLineEdit(self)
+        self.seed.setPlaceholderText("Random")
+        layout.addRow("Seed:", self.seed)
         save = QPushButton("Save", self)
         save.pressed.connect(self.saveButton)
         layout.addRow("Save Bingo File:", save)
@@ -495,8 +1044,346 @@ class newBingoSetupDialog(QDialog):
         return {"list_file": self.list_file,
                 "size": self.bingo_size.value(),
                 "pokemon": self.pokemon.isChecked(),
-                "save_file": self.save_file}
+                "save_file": self.save_file,
+                "seed": self.seed.text().strip(),
+                "balance": {"tolerance": self.tolerance.value() / 100,
+                            "category_cap": -1 if self.category_cap_auto.isChecked() else self.category_cap.value()}}
     
+class boardCodeDialog(QDialog):
+    def __init__(self):
+        super().__init__()
+
+        self.setWindowIcon(QIcon("resources/icon.ico"))
+        self.setWindowTitle("Open Board Code")
+
+        buttonBox = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        buttonBox.accepted.connect(self.accept)
+        buttonBox.rejected.connect(self.reject)
+
+        layout = QFormLayout(self)
+
+        self.code = QLineEdit(self)
+        layout.addRow("Board Code:", self.code)
+        open = QPushButton("Open", self)
+        open.pressed.connect(self.openButton)
+        layout.addRow("Import List of Objectives:", open)
+        self.list_file = ""
+        self.list_file_label = QLabel(self)
+        layout.addRow("List of Objectives Location:", self.list_file_label)
+        save = QPushButton("Save", self)
+        save.pressed.connect(self.saveButton)
+        layout.addRow("Save Bingo File:", save)
+        self.save_file = ""
+        self.save_file_label = QLabel(self)
+        layout.addRow("Save File Location:", self.save_file_label)
+
+        layout.addWidget(buttonBox)
+
+    def openButton(self):
+        fileName, _ = QFileDialog.getOpenFileName(self, "THE List File", "","CSV File (*.csv);;Text File (*.txt);;All Files (*)")
+        if fileName:
+            self.list_file = fileName
+            self.list_file_label.setText(fileName)
+
+    def saveButton(self):
+        fileName, _ = QFileDialog.getSaveFileName(self, "Save As", "","JSON File (*.json)")
+        if fileName:
+            root, ext = os_path.splitext(fileName)
+            ext = ".json"
+            fileName = root + ext
+            self.save_file = fileName
+            self.save_file_label.setText(fileName)
+
+    def output(self) -> dict:
+        return {"code": self.code.text().strip(),
+                "list_file": self.list_file,
+                "save_file": self.save_file}
+
+class syncBridge(QObject):
+    """
+    Hands sync callbacks from network threads over to the UI thread.
+    """
+    deltas = Signal(int, object, str)
+    snapshot = Signal(int, object)
+
+class joinSessionDialog(QDialog):
+    def __init__(self):
+        super().__init__()
+
+        self.setWindowIcon(QIcon("resources/icon.ico"))
+        self.setWindowTitle("Join Session")
+
+        buttonBox = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        buttonBox.accepted.connect(self.accept)
+        buttonBox.rejected.connect(self.reject)
+
+        layout = QFormLayout(self)
+
+        self.address = QLineEdit(self)
+        self.address.setPlaceholderText("e.g. 192.168.1.20")
+        layout.addRow("Host Address:", self.address)
+        self.port = QSpinBox(self, minimum=1024, maximum=65535, value=SYNC_PORT)
+        layout.addRow("Port:", self.port)
+        save = QPushButton("Save", self)
+        save.pressed.connect(self.saveButton)
+        layout.addRow("Save Bingo File:", save)
+        self.save_file = ""
+        self.save_file_label = QLabel(self)
+        layout.addRow("Save File Location:", self.save_file_label)
+
+        layout.addWidget(buttonBox)
+
+    def saveButton(self):
+        fileName, _ = QFileDialog.getSaveFileName(self, "Save As", "","JSON File (*.json)")
+        if fileName:
+            root, ext = os_path.splitext(fileName)
+            ext = ".json"
+            fileName = root + ext
+            self.save_file = fileName
+            self.save_file_label.setText(fileName)
+
+    def output(self) -> dict:
+        return {"address": self.address.text().strip(),
+                "port": self.port.value(),
+                "save_file": self.save_file}
+
+class analyticsDialog(QDialog):
+    def __init__(self, bingo_dict: dict):
+        super().__init__()
+
+        self.bingo_dict = bingo_dict
+
+        self.setWindowIcon(QIcon("resources/icon.ico"))
+        self.setWindowTitle("Session Analytics")
+        self.resize(600, 700)
+
+        buttonBox = QDialogButtonBox(QDialogButtonBox.StandardButton.Close)
+        buttonBox.rejected.connect(self.reject)
+
+        layout = QFormLayout(self)
+
+        self.window = QSpinBox(self, minimum=1, maximum=24*60, value=60, suffix=" min")
+        self.window.valueChanged.connect(self.update_report)
+        layout.addRow("Completion Rate Window:", self.window)
+        self.report = QPlainTextEdit(self)
+        self.report.setReadOnly(True)
+        self.report.setFont(QFontDatabase.systemFont(QFontDatabase.SystemFont.FixedFont))
+        layout.addRow(self.report)
+        self.update_report()
+
+        layout.addWidget(buttonBox)
+
+    def update_report(self):
+        self.report.setPlainText(analytics_report(self.bingo_dict, self.window.value() * 60))
+
+class libraryDialog(QDialog):
+    def __init__(self, library: Library, complete_color: str):
+        super().__init__()
+
+        self.library = library
+        self.complete_color = complete_color
+        self.saves = []
+
+        self.setWindowIcon(QIcon("resources/icon.ico"))
+        self.setWindowTitle("Session Library")
+        self.resize(800, 600)
+
+        buttonBox = QDialogButtonBox(QDialogButtonBox.StandardButton.Open | QDialogButtonBox.StandardButton.Cancel)
+        buttonBox.accepted.connect(self.accept)
+        buttonBox.rejected.connect(self.reject)
+
+        layout = QVBoxLayout(self)
+
+        buttons = QHBoxLayout()
+        add_folder = QPushButton("Add Folder", self)
+        add_folder.pressed.connect(self.addFolder)
+        buttons.addWidget(add_folder)
+        remove = QPushButton("Remove From Library", self)
+        remove.pressed.connect(self.removeSave)
+        buttons.addWidget(remove)
+        buttons.addStretch()
+        layout.addLayout(buttons)
+
+        self.table = QTableWidget(0, 6, self)
+        self.table.setHorizontalHeaderLabels(["Session", "Size", "Pokemon", "Progress", "Lines", "Last Modified"])
+        self.table.setIconSize(QSize(48, 48))
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        self.table.cellDoubleClicked.connect(self.accept)
+        layout.addWidget(self.table)
+        self.update_table()
+
+        layout.addWidget(buttonBox)
+
+    def update_table(self):
+        self.saves = self.library.refresh()
+        self.table.setRowCount(len(self.saves))
+        for row, (file, mtime, header) in enumerate(self.saves):
+            name = QTableWidgetItem(self.thumbnail(header), os_path.splitext(os_path.basename(file))[0])
+            name.setToolTip(file)
+            self.table.setItem(row, 0, name)
+            self.table.setItem(row, 1, QTableWidgetItem("{0}x{0}".format(header["size"])))
+            self.table.setItem(row, 2, QTableWidgetItem("Yes" if header["pokemon"] else "No"))
+            self.table.setItem(row, 3, QTableWidgetItem("{}% ({}/{} objectives)".format(header["completion"], header["completed"], header["objectives"])))
+            self.table.setItem(row, 4, QTableWidgetItem(str(header["lines"])))
+            self.table.setItem(row, 5, QTableWidgetItem(strftime("%Y-%m-%d %H:%M", localtime(mtime))))
+            self.table.setRowHeight(row, 52)
+
+    def thumbnail(self, header: dict) -> QIcon:
+        """
+        The board as one pixel per cell, scaled up.
+        """
+        size = header["size"]
+        image = QImage(size, size, QImage.Format.Format_RGB32)
+        image.fill(QColor("#404040"))
+        done = QColor(self.complete_color).rgb()
+        for n, cell in enumerate(header["cells"]):
+            if cell == "1":
+                image.setPixel(n % size, n // size, done)
+        return QIcon(QPixmap.fromImage(image).scaled(48, 48))
+
+    def addFolder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Add Folder")
+        if folder:
+            self.library.add_folder(folder)
+            self.update_table()
+
+    def removeSave(self):
+        row = self.table.currentRow()
+        if row >= 0:
+            self.library.remove(self.saves[row][0])
+            self.update_table()
+
+    def output(self) -> tuple[str, dict | None]:
+        """
+        Returns the chosen save file and its already-read header.
+        """
+        row = self.table.currentRow()
+        if row < 0:
+            return "", None
+        return self.saves[row][0], self.saves[row][2]
+
+class linkListDialog(QDialog):
+    def __init__(self, list_file: str, replace_removed: bool):
+        super().__init__()
+
+        self.setWindowIcon(QIcon("resources/icon.ico"))
+        self.setWindowTitle("Link List File")
+
+        buttonBox = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        buttonBox.accepted.connect(self.accept)
+        buttonBox.rejected.connect(self.reject)
+
+        layout = QFormLayout(self)
+
+        open = QPushButton("Open", self)
+        open.pressed.connect(self.openButton)
+        layout.addRow("Objectives List File:", open)
+        self.list_file = list_file
+        self.list_file_label = QLabel(list_file, self)
+        layout.addRow("List File Location:", self.list_file_label)
+        self.replace_removed = QCheckBox(self)
+        self.replace_removed.setChecked(replace_removed)
+        layout.addRow("Replace Removed Objectives On The Board:", self.replace_removed)
+        layout.addRow(QLabel("Otherwise they get flagged and stay until they're replaced.", self))
+
+        layout.addWidget(buttonBox)
+
+    def openButton(self):
+        fileName, _ = QFileDialog.getOpenFileName(self, "Open File", "","CSV File (*.csv);;All Files (*)")
+        if fileName:
+            self.list_file = fileName
+            self.list_file_label.setText(fileName)
+
+    def output(self) -> dict:
+        return {"file": self.list_file,
+                "replace_removed": self.replace_removed.isChecked()}
+
+class difficultyDialog(QDialog):
+    def __init__(self, bingo: Bingo, montecarlo):
+        super().__init__()
+
+        self.bingo = bingo
+        self.montecarlo = montecarlo
+        self.estimates = None
+
+        self.setWindowIcon(QIcon("resources/icon.ico"))
+        self.setWindowTitle("Board Difficulty")
+        self.resize(650, 750)
+
+        buttonBox = QDialogButtonBox(QDialogButtonBox.StandardButton.Close)
+        buttonBox.rejected.connect(self.reject)
+
+        layout = QFormLayout(self)
+
+        self.hours_per_weight = QDoubleSpinBox(self, minimum=0.01, maximum=100, value=1, singleStep=0.25, suffix=" h")
+        layout.addRow("Hours Per Weight:", self.hours_per_weight)
+        estimates = QPushButton("Open", self)
+        estimates.pressed.connect(self.openEstimates)
+        layout.addRow("Time Estimates File (optional):", estimates)
+        self.estimates_label = QLabel(self)
+        layout.addRow("Time Estimates File Location:", self.estimates_label)
+        self.cv = QDoubleSpinBox(self, minimum=0.1, maximum=3, value=1, singleStep=0.1)
+        layout.addRow("Variability (1 = exponential):", self.cv)
+        self.sequential = QCheckBox(self)
+        layout.addRow("One Objective At A Time:", self.sequential)
+        self.horizon = QDoubleSpinBox(self, minimum=0.5, maximum=1000, value=24, suffix=" h")
+        layout.addRow("Marathon Length:", self.horizon)
+        self.simulations = QSpinBox(self, minimum=10000, maximum=10000000, value=1000000, singleStep=100000)
+        layout.addRow("Simulations:", self.simulations)
+        run = QPushButton("Run", self)
+        run.pressed.connect(self.run)
+        layout.addRow(run)
+        self.report = QPlainTextEdit(self)
+        self.report.setReadOnly(True)
+        self.report.setFont(QFontDatabase.systemFont(QFontDatabase.SystemFont.FixedFont))
+        layout.addRow(self.report)
+
+        layout.addWidget(buttonBox)
+
+    def openEstimates(self):
+        fileName, _ = QFileDialog.getOpenFileName(self, "Open File", "","CSV File (*.csv);;All Files (*)")
+        if fileName:
+            try:
+                self.estimates = self.montecarlo.read_estimates(fileName)
+                self.estimates_label.setText(fileName)
+            except (OSError, ValueError) as e:
+                self.estimates = None
+                self.estimates_label.setText(str(e))
+
+    def run(self):
+        result = self.montecarlo.analyze(self.bingo, self.simulations.value(), self.hours_per_weight.value(), self.estimates,
+                                         self.cv.value(), self.sequential.isChecked())
+        self.report.setPlainText(self.montecarlo.report(result, self.horizon.value()))
+
+class selectLineDialog(QDialog):
+    def __init__(self, size: int):
+        super().__init__()
+
+        self.setWindowIcon(QIcon("resources/icon.ico"))
+        self.setWindowTitle("Select Line")
+
+        buttonBox = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        buttonBox.accepted.connect(self.accept)
+        buttonBox.rejected.connect(self.reject)
+
+        layout = QFormLayout(self)
+
+        self.line = QComboBox(self)
+        self.line.addItems([line_name(n, size) for n in range(2*size + 2)])
+        layout.addRow("Line:", self.line)
+
+        layout.addWidget(buttonBox)
+
+    def output(self) -> int:
+        """
+        Returns the index of the line in Bingo.lines().
+        """
+        return self.line.currentIndex()
+
 class replacePokeDialog(QDialog):
     def __init__(self, poke_list: list):
         super().__init__()
@@ -736,10 +1623,15 @@ class appearanceDialog(QDialog):
         self.text_font.addItems(QFontDatabase.families())
         self.text_font.setCurrentText(current_app_settings["font"])
         layout.addRow("Font", self.text_font)
+        self.text_fit = QCheckBox(self)
+        self.text_fit.setChecked(current_app_settings["text_fit"])
+        layout.addRow("Fit Text To Squares:", self.text_fit)
         self.text_size = QSpinBox(self)
         self.text_size.setValue(current_app_settings["text_size"])
         self.text_size.setMinimum(10)
         self.text_size.setMaximum(50)
+        self.text_size.setEnabled(not self.text_fit.isChecked())
+        self.text_fit.toggled.connect(lambda checked: self.text_size.setEnabled(not checked))
         layout.addRow("Text size:", self.text_size)
         self.text_bold = QCheckBox(self)
         self.text_bold.setChecked(current_app_settings["text_bold"])
@@ -781,4 +1673,5 @@ class appearanceDialog(QDialog):
                 "font": self.text_font.currentText(),
                 "text_size": self.text_size.value(),
                 "text_bold": self.text_bold.isChecked(),
+                "text_fit": self.text_fit.isChecked(),
                 "text_color": self.text_color.text() if self.hexCheck(self.text_color.text()) else "#ffffff"}
\ No newline at end of file